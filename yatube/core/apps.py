@@ -1,5 +1,18 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.core import checks
+from django.db.backends.signals import connection_created
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from .checks import shared_cache_check
+        checks.register(shared_cache_check)
+        from .db import apply_sqlite_pragmas
+        connection_created.connect(
+            apply_sqlite_pragmas, dispatch_uid='core.db.sqlite_pragmas')
+        if settings.TEMPLATE_WARMUP:
+            from .template_cache import warm_up
+            warm_up()
@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.core.checks import Warning
+
+
+def shared_cache_check(app_configs, **kwargs):
+    # Версии фрагментов и сессии в LocMemCache видны только своему процессу;
+    # тесты идут в одном процессе, хотя раннер и выключает DEBUG
+    if settings.SHARED_CACHE or settings.DEBUG or settings.TESTING:
+        return []
+    return [Warning(
+        'CACHE_BACKEND не общий для процессов: сброс фрагментов '
+        'в одном воркере не виден остальным.',
+        hint='Укажите memcached или redis в CACHE_BACKEND; до тех пор '
+             'фрагменты хранятся FRAGMENT_CACHE_TTL секунд.',
+        id='core.W001',
+    )]
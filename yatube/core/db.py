@@ -0,0 +1,16 @@
+"""Настройка соединений с базой при их открытии.
+
+SQLite по умолчанию пишет журнал отката и блокирует читателей на время
+записи. В режиме WAL читатели не ждут писателя, synchronous=NORMAL
+не делает fsync на каждый коммит, а mmap читает файл базы без копирования.
+Прагмы действуют на соединение, поэтому их задаёт сигнал connection_created.
+"""
+from django.conf import settings
+
+
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
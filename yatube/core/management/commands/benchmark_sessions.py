@@ -0,0 +1,81 @@
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.metrics import nearest_rank
+
+User = get_user_model()
+
+ENGINES = ('db', 'cached_db', 'cache', 'signed_cookies')
+WRITES = ('INSERT', 'UPDATE', 'DELETE')
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает накладные расходы хранилищ сессий на запрос '
+            'авторизованного пользователя.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests', type=int, default=50,
+            help='Запросов на каждое хранилище.',
+        )
+        parser.add_argument(
+            '--url', help='Страница для замера; по умолчанию лента подписок.')
+        parser.add_argument(
+            '--engines', nargs='+', choices=ENGINES, default=ENGINES,
+            help='Хранилища сессий для сравнения.',
+        )
+
+    def measure(self, user, url, requests):
+        client = Client(HTTP_HOST='localhost')
+        client.force_login(user)
+        client.get(url)
+        timings = []
+        session_queries = writes = 0
+        for _ in range(requests):
+            with ExitStack() as stack:
+                # Чтения сессий могут уйти на реплики
+                contexts = [
+                    stack.enter_context(
+                        CaptureQueriesContext(connections[alias]))
+                    for alias in (DEFAULT_DB_ALIAS, *settings.DB_REPLICAS)]
+                started = time.perf_counter()
+                response = client.get(url)
+                timings.append((time.perf_counter() - started) * 1000)
+            if response.status_code != 200:
+                raise CommandError(f'{url}: ответ {response.status_code}')
+            for context in contexts:
+                for query in context.captured_queries:
+                    session_queries += 'django_session' in query['sql']
+                    writes += query['sql'].lstrip().startswith(WRITES)
+        return (nearest_rank(timings, 0.5), nearest_rank(timings, 0.9),
+                session_queries / requests, writes / requests)
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1:
+            raise CommandError('--requests должно быть больше нуля.')
+        user = User.objects.order_by('pk').first()
+        if user is None:
+            raise CommandError('Нет пользователей: сначала запустите '
+                               'seed_data.')
+        url = options['url'] or reverse('posts:follow_index')
+        self.stdout.write(
+            f'{"хранилище":<16}{"p50":>9}{"p90":>9}{"SQL сессий":>12}'
+            f'{"записей":>9}')
+        for engine in options['engines']:
+            backend = f'django.contrib.sessions.backends.{engine}'
+            with override_settings(SESSION_ENGINE=backend):
+                p50, p90, session_queries, writes = self.measure(
+                    user, url, options['requests'])
+            self.stdout.write(
+                f'{engine:<16}{p50:>9.1f}{p90:>9.1f}{session_queries:>12.1f}'
+                f'{writes:>9.1f}')
+        self.stdout.write('Время в миллисекундах, запросы — в среднем '
+                          'на один запрос страницы.')
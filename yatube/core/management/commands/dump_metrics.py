@@ -0,0 +1,55 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from core import metrics
+
+
+class Command(BaseCommand):
+    help = ('Выводит сводку метрик запросов по представлениям, '
+            'собранную всеми процессами сервера.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--json', action='store_true', help='Вывести сырые гистограммы.')
+        parser.add_argument(
+            '--reset', action='store_true',
+            help='Удалить накопленные метрики после вывода.',
+        )
+
+    def handle(self, *args, **options):
+        histograms = metrics.load()
+        if options['json']:
+            self.stdout.write(json.dumps(histograms, indent=2))
+        elif not histograms:
+            self.stdout.write('Метрик пока нет.')
+        else:
+            self.write_table(histograms)
+        if options['reset']:
+            metrics.reset()
+
+    def write_table(self, histograms):
+        self.stdout.write(
+            f'{"представление":<32}{"запросов":>9}{"сред.":>8}{"p50≤":>7}'
+            f'{"p99≤":>7}{"БД":>8}{"SQL":>6}{"повт.":>6}{"кеш %":>7}')
+        rows = sorted(histograms.items(),
+                      key=lambda item: item[1]['total_ms'], reverse=True)
+        for view, histogram in rows:
+            requests = histogram['requests']
+            lookups = histogram['cache_hits'] + histogram['cache_misses']
+            hit_rate = (
+                f'{100 * histogram["cache_hits"] / lookups:.0f}'
+                if lookups else '—')
+            p50, p99 = (
+                metrics.percentile(histogram, share) for share in (0.5, 0.99))
+            self.stdout.write(
+                f'{view[:31]:<32}{requests:>9}'
+                f'{histogram["total_ms"] / requests:>8.1f}'
+                f'{p50:>7g}{p99:>7g}'
+                f'{histogram["db_ms"] / requests:>8.1f}'
+                f'{histogram["queries"] / requests:>6.1f}'
+                f'{histogram["duplicates"] / requests:>6.1f}'
+                f'{hit_rate:>7}')
+        self.stdout.write(
+            'Время в миллисекундах на запрос; p50 и p99 — верхние границы '
+            'корзин гистограммы.')
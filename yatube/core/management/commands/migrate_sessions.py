@@ -0,0 +1,43 @@
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = ('Переносит действующие сессии из таблицы django_session '
+            'в кеш для SESSION_ENGINE cache или cached_db, чтобы при '
+            'смене хранилища пользователям не пришлось входить заново.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--delete', action='store_true',
+            help='Удалить перенесённые сессии из базы.',
+        )
+
+    def handle(self, *args, **options):
+        engine = settings.SESSION_ENGINE.rsplit('.', 1)[-1]
+        if engine == 'db':
+            self.stdout.write('Сессии уже хранятся в базе.')
+            return
+        if engine == 'signed_cookies':
+            self.stdout.write(
+                'Сессии в подписанных cookie хранит браузер, перенести их '
+                'нельзя: пользователи войдут заново.')
+            return
+        store_class = import_module(settings.SESSION_ENGINE).SessionStore
+        now = timezone.now()
+        sessions = Session.objects.filter(expire_date__gt=now)
+        moved = 0
+        for session in sessions.iterator():
+            store = store_class(session.session_key)
+            timeout = (session.expire_date - now).total_seconds()
+            store._cache.set(
+                store.cache_key, session.get_decoded(), int(timeout))
+            moved += 1
+        if options['delete'] and engine == 'cache':
+            # cached_db читает сессии из базы при промахе кеша — их не трогаем
+            Session.objects.all().delete()
+        self.stdout.write(f'Перенесено сессий: {moved}')
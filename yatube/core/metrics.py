@@ -0,0 +1,268 @@
+"""Метрики запросов без внешнего APM.
+
+RequestMetricsMiddleware замеряет для каждого запроса полное время, время
+и число SQL-запросов, повторы одинаковых запросов и попадания в кеш.
+Результат уходит в заголовок Server-Timing, в строку лога core.metrics
+(JSON) и в гистограммы по представлениям. Гистограммы копятся в памяти
+процесса и сохраняются в METRICS_DIR файлом на процесс раз в
+METRICS_FLUSH_INTERVAL секунд, каждые METRICS_FLUSH_REQUESTS запросов и при
+выходе из процесса; manage.py dump_metrics сводит файлы всех процессов.
+"""
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+# Верхние границы корзин гистограммы времени, мс
+BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, float('inf'))
+FIELDS = ('requests', 'total_ms', 'db_ms', 'queries', 'duplicates',
+          'cache_hits', 'cache_misses')
+
+_local = threading.local()
+_lock = threading.Lock()
+_histograms = {}
+_last_flush = time.monotonic()
+_unflushed = 0
+_missing = object()
+
+
+class RequestStats:
+    def __init__(self):
+        self.db_time = 0.0
+        self.statements = Counter()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.in_cache_call = False
+
+    @property
+    def queries(self):
+        return sum(self.statements.values())
+
+    @property
+    def duplicates(self):
+        return sum(count - 1 for count in self.statements.values())
+
+    def record_query(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.statements[(sql, str(params))] += 1
+
+
+def _current():
+    return getattr(_local, 'stats', None)
+
+
+def _counted_get(get):
+    def counted(self, key, default=None, version=None):
+        stats = _current()
+        if stats is None or stats.in_cache_call:
+            return get(self, key, default, version)
+        stats.in_cache_call = True
+        try:
+            value = get(self, key, _missing, version)
+        finally:
+            stats.in_cache_call = False
+        if value is _missing:
+            stats.cache_misses += 1
+            return default
+        stats.cache_hits += 1
+        return value
+    counted.counted = True
+    return counted
+
+
+def _counted_get_many(get_many):
+    def counted(self, keys, version=None):
+        stats = _current()
+        if stats is None or stats.in_cache_call:
+            return get_many(self, keys, version)
+        keys = list(keys)
+        # Базовый get_many вызывает get — не считаем ключи дважды
+        stats.in_cache_call = True
+        try:
+            found = get_many(self, keys, version)
+        finally:
+            stats.in_cache_call = False
+        stats.cache_hits += len(found)
+        stats.cache_misses += len(keys) - len(found)
+        return found
+    counted.counted = True
+    return counted
+
+
+def install_cache_counters():
+    """Считать попадания в кеш для всех бэкендов из CACHES."""
+    for options in settings.CACHES.values():
+        backend = import_string(options['BACKEND'])
+        if not getattr(backend.get, 'counted', False):
+            backend.get = _counted_get(backend.get)
+        if not getattr(backend.get_many, 'counted', False):
+            backend.get_many = _counted_get_many(backend.get_many)
+
+
+def record(view, total_ms, stats):
+    global _unflushed
+    with _lock:
+        _unflushed += 1
+        histogram = _histograms.setdefault(view, {
+            **dict.fromkeys(FIELDS, 0), 'buckets': [0] * len(BUCKETS)})
+        histogram['requests'] += 1
+        histogram['total_ms'] += total_ms
+        histogram['db_ms'] += stats.db_time * 1000
+        histogram['queries'] += stats.queries
+        histogram['duplicates'] += stats.duplicates
+        histogram['cache_hits'] += stats.cache_hits
+        histogram['cache_misses'] += stats.cache_misses
+        for index, bound in enumerate(BUCKETS):
+            if total_ms <= bound:
+                histogram['buckets'][index] += 1
+                break
+
+
+def snapshot():
+    with _lock:
+        return json.loads(json.dumps(_histograms))
+
+
+def flush(force=False):
+    """Сохранить гистограммы процесса в METRICS_DIR."""
+    global _last_flush, _unflushed
+    now = time.monotonic()
+    due = (now - _last_flush >= settings.METRICS_FLUSH_INTERVAL
+           or _unflushed >= settings.METRICS_FLUSH_REQUESTS)
+    if not force and not due:
+        return
+    _last_flush = now
+    _unflushed = 0
+    os.makedirs(settings.METRICS_DIR, exist_ok=True)
+    path = os.path.join(settings.METRICS_DIR, f'metrics-{os.getpid()}.json')
+    with open(path + '.tmp', 'w', encoding='utf-8') as stream:
+        json.dump(snapshot(), stream)
+    os.replace(path + '.tmp', path)
+
+
+def _flush_at_exit():
+    # Иначе процесс короче METRICS_FLUSH_INTERVAL (benchmark_views,
+    # перезапущенный воркер) не оставит ни одного файла
+    if _unflushed:
+        flush(force=True)
+
+
+# Тесты не пишут свои запросы в общий METRICS_DIR
+if not settings.TESTING:
+    atexit.register(_flush_at_exit)
+
+
+def merge(snapshots):
+    merged = {}
+    for histograms in snapshots:
+        for view, histogram in histograms.items():
+            total = merged.setdefault(view, {
+                **dict.fromkeys(FIELDS, 0), 'buckets': [0] * len(BUCKETS)})
+            for field in FIELDS:
+                total[field] += histogram[field]
+            total['buckets'] = [
+                a + b for a, b in zip(total['buckets'], histogram['buckets'])]
+    return merged
+
+
+def load():
+    """Гистограммы всех процессов, сохранённые в METRICS_DIR."""
+    if not os.path.isdir(settings.METRICS_DIR):
+        return {}
+    snapshots = []
+    for name in os.listdir(settings.METRICS_DIR):
+        if name.startswith('metrics-') and name.endswith('.json'):
+            with open(os.path.join(settings.METRICS_DIR, name),
+                      encoding='utf-8') as stream:
+                snapshots.append(json.load(stream))
+    return merge(snapshots)
+
+
+def reset():
+    global _unflushed
+    with _lock:
+        _histograms.clear()
+        _unflushed = 0
+    if os.path.isdir(settings.METRICS_DIR):
+        for name in os.listdir(settings.METRICS_DIR):
+            if name.startswith('metrics-'):
+                os.remove(os.path.join(settings.METRICS_DIR, name))
+
+
+def nearest_rank(values, share):
+    """Перцентиль выборки по ближайшему рангу."""
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, round(share * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def percentile(histogram, share):
+    """Верхняя граница корзины, в которую попадает перцентиль."""
+    rank = share * histogram['requests']
+    seen = 0
+    for bound, count in zip(BUCKETS, histogram['buckets']):
+        seen += count
+        if count and seen >= rank:
+            return bound
+    return BUCKETS[-1]
+
+
+class RequestMetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        install_cache_counters()
+
+    def __call__(self, request):
+        stats = _local.stats = RequestStats()
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(stats.record_query))
+                response = self.get_response(request)
+        finally:
+            _local.stats = None
+        total_ms = (time.perf_counter() - started) * 1000
+
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+        record(view, total_ms, stats)
+        db_ms = stats.db_time * 1000
+        if settings.SERVER_TIMING:
+            response['Server-Timing'] = ', '.join([
+                f'total;dur={total_ms:.1f}',
+                # Заголовок в latin-1, поэтому описания по-английски
+                f'db;dur={db_ms:.1f};desc="{stats.queries} queries, '
+                f'{stats.duplicates} duplicates"',
+                f'cache;desc="{stats.cache_hits} hits, '
+                f'{stats.cache_misses} misses"',
+            ])
+        logger.info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'view': view,
+            'status': response.status_code,
+            'total_ms': round(total_ms, 1),
+            'db_ms': round(db_ms, 1),
+            'queries': stats.queries,
+            'duplicates': stats.duplicates,
+            'cache_hits': stats.cache_hits,
+            'cache_misses': stats.cache_misses,
+        }, ensure_ascii=False))
+        flush()
+        return response
@@ -0,0 +1,86 @@
+"""Профилировщик рендеринга шаблонов.
+
+При TEMPLATE_PROFILING метод Template._render оборачивается замером
+времени, а TemplateProfilerMiddleware после каждого запроса пишет в лог
+core.profiling строку с временем каждого шаблона и {% include %}: полное
+(вместе с вложенными) и собственное, плюс число рендерингов.
+"""
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from django.template.base import Template
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+
+class RenderProfile:
+    def __init__(self):
+        # имя шаблона -> [рендерингов, полное время, собственное время]
+        self.timings = defaultdict(lambda: [0, 0.0, 0.0])
+        self.stack = []
+
+    def start(self):
+        self.stack.append(0.0)
+
+    def stop(self, name, elapsed):
+        children = self.stack.pop()
+        if self.stack:
+            self.stack[-1] += elapsed
+        timing = self.timings[name]
+        timing[0] += 1
+        timing[1] += elapsed
+        timing[2] += elapsed - children
+
+    def summary(self):
+        """Шаблоны по убыванию собственного времени, в миллисекундах."""
+        rows = [
+            (name, count, total * 1000, own * 1000)
+            for name, (count, total, own) in self.timings.items()
+        ]
+        return sorted(rows, key=lambda row: row[3], reverse=True)
+
+
+def _profiled(render):
+    def profiled_render(self, context):
+        profile = getattr(_local, 'profile', None)
+        if profile is None:
+            return render(self, context)
+        profile.start()
+        started = time.perf_counter()
+        try:
+            return render(self, context)
+        finally:
+            profile.stop(
+                self.name or '<string>', time.perf_counter() - started)
+    profiled_render.profiled = True
+    return profiled_render
+
+
+def install():
+    # Оборачиваем текущий _render: тестовый раннер тоже подменяет его
+    if not getattr(Template._render, 'profiled', False):
+        Template._render = _profiled(Template._render)
+
+
+class TemplateProfilerMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        install()
+
+    def __call__(self, request):
+        _local.profile = profile = RenderProfile()
+        try:
+            response = self.get_response(request)
+        finally:
+            _local.profile = None
+        request.template_profile = profile
+        if profile.timings:
+            logger.info('%s %s: %s', request.method, request.path, '; '.join(
+                f'{name} {own:.1f}/{total:.1f} мс ×{count}'
+                for name, count, total, own in profile.summary()
+            ))
+        return response
@@ -0,0 +1,76 @@
+"""Чтение с реплик базы.
+
+ReplicaMiddleware разрешает читать с реплик из DB_REPLICAS только в
+безопасных запросах (GET, HEAD, OPTIONS) и выбирает одну реплику на весь
+запрос, а ReplicaRouter направляет туда его чтения. Всё остальное идёт в
+default: записи, чтения в транзакциях, команды manage.py и фоновые потоки.
+
+Реплика отстаёт от основной базы, поэтому после записи запрос и
+следующие DB_STICKY_SECONDS секунд запросов того же браузера (по cookie)
+читают из default и видят свои изменения. Долгоживущие кеши заполняются
+из default (posts/follow_graph.py), а фрагменты, отрисованные по данным
+реплики, живут не дольше DB_STICKY_SECONDS (posts/fragments.py).
+"""
+import random
+import threading
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+STICKY_COOKIE = 'db_primary'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_local = threading.local()
+
+
+def reading_replica():
+    """Читает ли текущий запрос с реплики."""
+    if getattr(_local, 'replica', None) is None:
+        return False
+    return not connections[DEFAULT_DB_ALIAS].in_atomic_block
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if not reading_replica():
+            return None
+        return _local.replica
+
+    def db_for_write(self, model, **hints):
+        # Дальше в этом запросе читаем свою запись из основной базы
+        _local.replica = None
+        _local.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # На репликах те же данные, что и в default
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.DB_REPLICAS:
+            return self.get_response(request)
+        unsafe = request.method not in SAFE_METHODS
+        _local.replica = None
+        if not unsafe and STICKY_COOKIE not in request.COOKIES:
+            # Одна реплика на запрос: у разных реплик разное отставание
+            _local.replica = random.choice(settings.DB_REPLICAS)
+        _local.wrote = False
+        try:
+            response = self.get_response(request)
+        finally:
+            wrote = _local.wrote
+            _local.replica = None
+            _local.wrote = False
+        if unsafe or wrote:
+            response.set_cookie(
+                STICKY_COOKIE, '1', max_age=settings.DB_STICKY_SECONDS,
+                httponly=True, samesite='Lax')
+        return response
@@ -0,0 +1,44 @@
+"""Прогрев кешированного загрузчика шаблонов.
+
+В режиме TEMPLATE_CACHE шаблоны читаются с диска и разбираются один раз
+на процесс. warm_up() делает это при старте для шаблонов проекта, чтобы
+первые запросы не платили за разбор.
+"""
+import logging
+import os
+
+from django.conf import settings
+from django.template import TemplateSyntaxError, engines
+
+logger = logging.getLogger(__name__)
+
+
+def project_templates(backend):
+    """Имена шаблонов из каталогов проекта; шаблоны django.contrib не нужны."""
+    base_dir = os.path.join(settings.BASE_DIR, '')
+    for template_dir in backend.template_dirs:
+        if not template_dir.startswith(base_dir):
+            continue
+        for root, _, files in os.walk(template_dir):
+            for name in files:
+                if name.endswith('.html'):
+                    path = os.path.join(root, name)
+                    yield os.path.relpath(path, template_dir).replace(
+                        os.sep, '/')
+
+
+def warm_up():
+    """Разобрать шаблоны проекта; вернуть число загруженных."""
+    loaded = 0
+    for backend in engines.all():
+        engine = getattr(backend, 'engine', None)
+        if engine is None:
+            continue
+        for name in project_templates(backend):
+            try:
+                engine.get_template(name)
+            except TemplateSyntaxError:
+                logger.exception('Не удалось разобрать шаблон %s', name)
+            else:
+                loaded += 1
+    return loaded
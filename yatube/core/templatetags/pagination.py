@@ -0,0 +1,36 @@
+from django import template
+from django.conf import settings
+
+register = template.Library()
+
+
+@register.simple_tag
+def page_window(page_obj, on_each_side=None, on_ends=None):
+    """Номера страниц вокруг текущей и по краям; None — пропуск «…».
+
+    Число ссылок не зависит от числа страниц (как get_elided_page_range
+    из Django 3.2).
+    """
+    if on_each_side is None:
+        on_each_side = settings.PAGINATOR_ON_EACH_SIDE
+    if on_ends is None:
+        on_ends = settings.PAGINATOR_ON_ENDS
+    number = page_obj.number
+    num_pages = page_obj.paginator.num_pages
+    if num_pages <= (on_each_side + on_ends) * 2:
+        return list(range(1, num_pages + 1))
+
+    pages = []
+    if number > 1 + on_each_side + on_ends + 1:
+        pages += range(1, on_ends + 1)
+        pages.append(None)
+        pages += range(number - on_each_side, number + 1)
+    else:
+        pages += range(1, number + 1)
+    if number < num_pages - on_each_side - on_ends - 1:
+        pages += range(number + 1, number + on_each_side + 1)
+        pages.append(None)
+        pages += range(num_pages - on_ends + 1, num_pages + 1)
+    else:
+        pages += range(number + 1, num_pages + 1)
+    return pages
@@ -1,5 +1,6 @@
 from django.contrib import admin
 
+from . import search_index
 from .models import Post, Group
 
 
@@ -10,6 +11,14 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        # Ищем по индексу, а не через LIKE '%...%' по всей таблице
+        if not search_term:
+            return super().get_search_results(
+                request, queryset, search_term)
+        post_ids = search_index.post_ids(search_term)
+        return queryset.filter(pk__in=post_ids), False
+
 
 admin.site.register(Post, PostAdmin)
 admin.site.register(Group)
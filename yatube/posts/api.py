@@ -0,0 +1,140 @@
+"""JSON API лент только для чтения.
+
+Ленты берутся из тех же запросов, что и в HTML-страницах (posts/feeds.py).
+Условные запросы по ETag обрабатывает posts/conditional.py: если лента
+не изменилась, клиент получает 304 без запросов к базе.
+"""
+from functools import wraps
+
+from django.http import Http404, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.http import urlencode
+from django.views.decorators.http import require_safe
+
+from . import comments as threads
+from . import feeds, timeline
+from .conditional import (conditional, follow_scope, group_scope, index_scope,
+                          post_scope, profile_scope)
+from .models import Post
+from .views import paginate
+
+
+def serialize_post(post):
+    return {
+        'id': post.pk,
+        'text': post.text,
+        'pub_date': post.pub_date.isoformat(),
+        'author': post.author.username,
+        'group': post.group.slug if post.group_id else None,
+        'image': post.image.url if post.image else None,
+        'thumbnail': post.thumbnail or None,
+        'comments_count': post.comments_count,
+    }
+
+
+def serialize_comment(comment):
+    return {
+        'id': comment.pk,
+        'author': comment.author.username,
+        'text': comment.text,
+        'created': comment.created.isoformat(),
+        'parent': comment.parent_id,
+        'replies_count': comment.replies_count,
+    }
+
+
+def comments_data(request, post, parent_id=None):
+    page = threads.comment_page(post, request.GET.get('cursor'), parent_id)
+    next_link = None
+    if page.next_cursor:
+        query = {'cursor': page.next_cursor}
+        if parent_id:
+            query['parent'] = parent_id
+        next_link = '{}?{}'.format(
+            reverse('posts:api_comments', args=[post.pk]), urlencode(query))
+    return [serialize_comment(comment) for comment in page], next_link
+
+
+def _page_link(request, page_obj, forward):
+    if getattr(page_obj, 'cursor_based', False):
+        cursor = page_obj.next_cursor if forward else page_obj.previous_cursor
+        if not cursor:
+            return None
+        return f'{request.path}?{urlencode({"cursor": cursor})}'
+    if forward and page_obj.has_next():
+        number = page_obj.next_page_number()
+    elif not forward and page_obj.has_previous():
+        number = page_obj.previous_page_number()
+    else:
+        return None
+    return f'{request.path}?{urlencode({"page": number})}'
+
+
+def page_response(request, posts, cursor_key=None):
+    page_obj = paginate(request, posts, cursor_key)
+    return JsonResponse({
+        'results': [serialize_post(post) for post in page_obj],
+        'next': _page_link(request, page_obj, forward=True),
+        'previous': _page_link(request, page_obj, forward=False),
+    }, json_dumps_params={'ensure_ascii': False})
+
+
+def api_login_required(view):
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse(
+                {'detail': 'Требуется авторизация.'}, status=401)
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+@require_safe
+@conditional(index_scope)
+def index(request):
+    return page_response(request, feeds.index_feed())
+
+
+@require_safe
+@conditional(group_scope)
+def group_posts(request, slug):
+    return page_response(request, feeds.group_feed(request.scope_object))
+
+
+@require_safe
+@conditional(profile_scope)
+def profile(request, username):
+    return page_response(request, feeds.profile_feed(request.scope_object))
+
+
+@require_safe
+@conditional(post_scope)
+def post_detail(request, post_id):
+    post = get_object_or_404(feeds.index_feed(), pk=post_id)
+    data = serialize_post(post)
+    data['comments'], data['comments_next'] = comments_data(request, post)
+    return JsonResponse(data, json_dumps_params={'ensure_ascii': False})
+
+
+@require_safe
+@conditional(post_scope)
+def comments(request, post_id):
+    post = get_object_or_404(Post, pk=post_id)
+    try:
+        parent_id = int(request.GET.get('parent') or 0) or None
+    except ValueError:
+        raise Http404
+    results, next_link = comments_data(request, post, parent_id)
+    return JsonResponse(
+        {'results': results, 'next': next_link},
+        json_dumps_params={'ensure_ascii': False})
+
+
+@require_safe
+@api_login_required
+@conditional(follow_scope)
+def follow_index(request):
+    return page_response(
+        request, feeds.follow_feed(request.user),
+        timeline.cursor_key(request.user))
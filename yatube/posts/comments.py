@@ -0,0 +1,108 @@
+"""Ветки комментариев и их постраничный вывод.
+
+Страница поста показывает только первую страницу комментариев верхнего
+уровня; следующие страницы и ответы подгружаются фрагментами
+(views.comments) по курсору на created, поэтому размер страницы поста
+не зависит от числа комментариев. В лентах под постами видны последние
+комментарии: их для всей страницы отдаёт один оконный запрос (latest).
+"""
+import sqlite3
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment
+from .paginators import CursorPaginator
+
+User = get_user_model()
+
+
+def attach(comment, parent):
+    """Сделать комментарий ответом на parent с учётом предельной глубины.
+
+    Ответ глубже COMMENT_MAX_DEPTH встаёт рядом с parent, а не под ним.
+    """
+    if parent is None:
+        comment.parent, comment.depth = None, 0
+    elif parent.depth >= settings.COMMENT_MAX_DEPTH:
+        comment.parent_id, comment.depth = parent.parent_id, parent.depth
+    else:
+        comment.parent, comment.depth = parent, parent.depth + 1
+    return comment
+
+
+def thread(post, parent_id=None):
+    # Подзапрос вместо GROUP BY: порядок по индексу (post, parent, created)
+    replies = (
+        Comment.objects.filter(parent=OuterRef('pk')).order_by()
+        .values('parent').annotate(total=Count('pk')).values('total')
+    )
+    return (
+        post.comments.filter(parent_id=parent_id)
+        .select_related('author')
+        .annotate(replies_count=Coalesce(Subquery(replies), 0))
+    )
+
+
+def comment_page(post, cursor=None, parent_id=None):
+    paginator = CursorPaginator(
+        thread(post, parent_id), settings.COMMENTS_PER_PAGE,
+        field='created', descending=False)
+    return paginator.get_page(cursor)
+
+
+def _supports_window_functions():
+    # Django 2.2 не строит Window для SQLite, хотя SQLite 3.25+ их умеет
+    if connection.vendor == 'sqlite':
+        return sqlite3.sqlite_version_info >= (3, 25)
+    return connection.features.supports_over_clause
+
+
+def latest(post_ids, size):
+    """Последние size комментариев каждого поста: {post_id: [comment]}.
+
+    Комментарии отдаются по возрастанию created, у каждого есть
+    author_username, чтобы шаблон не читал автора отдельным запросом.
+    """
+    previews = defaultdict(list)
+    if not post_ids or not size:
+        return previews
+    if not _supports_window_functions():
+        # Тот же один запрос, но без ограничения числа строк на пост
+        comments = (
+            Comment.objects.filter(post_id__in=post_ids)
+            .annotate(author_username=F('author__username'))
+            .order_by('post_id', '-created', '-id')
+        )
+        for comment in comments:
+            if len(previews[comment.post_id]) < size:
+                previews[comment.post_id].append(comment)
+        for post_comments in previews.values():
+            post_comments.reverse()
+        return previews
+    placeholders = ', '.join(['%s'] * len(post_ids))
+    comments = Comment.objects.raw(
+        f"""
+        SELECT * FROM (
+            SELECT c.id, c.post_id, c.author_id, c.parent_id, c.depth,
+                   c.text, c.created, u.username AS author_username,
+                   ROW_NUMBER() OVER (
+                       PARTITION BY c.post_id
+                       ORDER BY c.created DESC, c.id DESC
+                   ) AS row_rank
+            FROM {Comment._meta.db_table} c
+            JOIN {User._meta.db_table} u ON u.id = c.author_id
+            WHERE c.post_id IN ({placeholders})
+        ) ranked
+        WHERE row_rank <= %s
+        ORDER BY post_id, created, id
+        """,
+        (*post_ids, size),
+    )
+    for comment in comments:
+        previews[comment.post_id].append(comment)
+    return previews
@@ -0,0 +1,92 @@
+"""Условные запросы и заголовки кеширования для лент и страниц постов.
+
+ETag собирается из версий кеша фрагментов (posts/fragments.py) области
+страницы: сигналы увеличивают их при публикации, правке и удалении постов,
+комментариях и подписках, так что валидатор почти не ходит в базу
+(страница поста узнаёт только автора, чтобы учесть его профиль).
+Last-Modified не отдаётся: правки и удаления не сдвигают ни pub_date,
+ни created. Если клиент или прокси прислал совпадающий ETag, ответ 304
+отдаётся без рендеринга.
+"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.shortcuts import get_object_or_404
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import condition
+
+from . import fragments
+from .models import Group, Post
+
+User = get_user_model()
+
+
+def etag(scopes):
+    """ETag страницы, которая зависит от областей кеша фрагментов."""
+    return hashlib.md5(fragments.key(*scopes).encode()).hexdigest()
+
+
+def index_scope(request):
+    return ['index']
+
+
+def group_scope(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    request.scope_object = group
+    return [f'group:{group.pk}']
+
+
+def profile_scope(request, username):
+    author = get_object_or_404(User, username=username)
+    request.scope_object = author
+    return [f'profile:{author.pk}']
+
+
+def post_scope(request, post_id):
+    # На странице поста есть и число постов автора из его профиля
+    author_id = Post.objects.filter(pk=post_id).values_list(
+        'author_id', flat=True).first()
+    if author_id is None:
+        return [f'post:{post_id}']
+    return [f'post:{post_id}', f'profile:{author_id}']
+
+
+def follow_scope(request):
+    return ['index', f'follow:{request.user.pk}']
+
+
+def conditional(scope_func):
+    """Условный GET по области, которую возвращает scope_func."""
+    def etag_func(request, **kwargs):
+        return etag(scope_func(request, **kwargs))
+
+    return condition(etag_func=etag_func)
+
+
+def public_page(scope_func):
+    """Кешируемая страница для анонимов.
+
+    Анонимы получают 304 и Cache-Control: public, и их ответы может держать
+    CDN или обратный прокси. Авторизованным страница рендерится как обычно
+    и помечается private: в ней имя пользователя и форма с CSRF-токеном.
+    """
+    def decorator(view):
+        conditional_view = conditional(scope_func)(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.user.is_authenticated:
+                response = view(request, *args, **kwargs)
+                patch_cache_control(response, private=True)
+            else:
+                response = conditional_view(request, *args, **kwargs)
+                patch_cache_control(
+                    response, public=True,
+                    max_age=settings.PUBLIC_PAGE_MAX_AGE)
+            # Один URL отдаёт разные страницы гостю и пользователю
+            patch_vary_headers(response, ['Cookie'])
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,107 @@
+"""Денормализованные счётчики постов, комментариев и подписок.
+
+Счётчики меняются атомарным UPDATE ... SET x = x ± 1 из сигналов,
+поэтому страницы профиля и поста не считают агрегаты на каждый запрос.
+Расхождения (bulk_create, правки в обход ORM) чинит manage.py recount.
+"""
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from . import follow_graph
+from .models import Comment, Follow, Post, UserStats
+
+User = get_user_model()
+
+
+def _change(queryset, field, delta):
+    if delta < 0:
+        # Не уходим в минус, если строка уже разошлась с реальностью
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    return queryset.update(**{field: F(field) + delta})
+
+
+def change_user(user_id, field, delta):
+    stats = UserStats.objects.filter(user_id=user_id)
+    if not _change(stats, field, delta) and delta > 0:
+        UserStats.objects.get_or_create(user_id=user_id)
+        _change(stats, field, delta)
+
+
+def change_post(post_id, delta):
+    _change(Post.objects.filter(pk=post_id), 'comments_count', delta)
+
+
+def stats_for(user):
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        return UserStats.objects.get_or_create(user=user)[0]
+
+
+def _count(model, field):
+    rows = (
+        model.objects.filter(**{field: OuterRef('pk')})
+        .order_by().values(field).annotate(total=Count('pk'))
+        .values('total')
+    )
+    return Coalesce(Subquery(rows), 0)
+
+
+def recount_follows(user_id, author_ids):
+    """Пересчитать подписки user_id и подписчиков author_ids по таблице.
+
+    Нужно после bulk_create, который обходит сигналы: прибавка числа
+    новых строк задвоится, если те же подписки вставил параллельный запрос.
+    """
+    stats = UserStats.objects.filter(user_id=user_id)
+    following = {'following_count': _count(Follow, 'user')}
+    if not stats.update(**following):
+        UserStats.objects.get_or_create(user_id=user_id)
+        stats.update(**following)
+    UserStats.objects.filter(user_id__in=author_ids).update(
+        followers_count=_count(Follow, 'author'))
+
+
+def _update_in_chunks(model, pks, values, size=500):
+    pks = list(pks)
+    fixed = 0
+    for start in range(0, len(pks), size):
+        chunk = pks[start:start + size]
+        fixed += model.objects.filter(pk__in=chunk).update(**values)
+    return fixed
+
+
+def recount_users():
+    """Пересчитать счётчики пользователей; вернуть число исправленных."""
+    UserStats.objects.bulk_create(
+        (UserStats(user_id=pk) for pk in User.objects.filter(
+            stats__isnull=True).values_list('pk', flat=True)),
+        ignore_conflicts=True,
+    )
+    real = {
+        'posts_count': _count(Post, 'author'),
+        'followers_count': _count(Follow, 'author'),
+        'following_count': _count(Follow, 'user'),
+    }
+    drifted = UserStats.objects.annotate(
+        **{f'real_{field}': value for field, value in real.items()}
+    ).filter(
+        ~Q(posts_count=F('real_posts_count'))
+        | ~Q(followers_count=F('real_followers_count'))
+        | ~Q(following_count=F('real_following_count'))
+    ).values_list('pk', 'user_id')
+    drifted = list(drifted)
+    fixed = _update_in_chunks(UserStats, [pk for pk, _ in drifted], real)
+    # Граф подписок в кеше мог разойтись с базой так же, как счётчики
+    user_ids = [user_id for _, user_id in drifted]
+    follow_graph.forget(user_ids, user_ids)
+    return fixed
+
+
+def recount_posts():
+    """Пересчитать счётчики комментариев; вернуть число исправленных."""
+    real = _count(Comment, 'post')
+    drifted = Post.objects.annotate(real=real).exclude(
+        comments_count=F('real')).values_list('pk', flat=True)
+    return _update_in_chunks(Post, drifted, {'comments_count': real})
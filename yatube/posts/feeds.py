@@ -0,0 +1,29 @@
+"""Запросы лент постов.
+
+Все ленты строятся здесь и сразу подтягивают автора и группу одним JOIN,
+а варианты картинок — одним запросом на страницу,
+чтобы шаблоны не делали по запросу на каждый пост.
+"""
+from . import timeline
+from .models import Post
+
+
+def with_relations(posts):
+    return posts.select_related('author', 'group').prefetch_related(
+        'image_variants')
+
+
+def index_feed():
+    return with_relations(Post.objects.all())
+
+
+def group_feed(group):
+    return with_relations(group.posts.all())
+
+
+def profile_feed(author):
+    return with_relations(author.posts.all())
+
+
+def follow_feed(user):
+    return with_relations(timeline.follow_feed(user))
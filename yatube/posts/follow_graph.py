@@ -0,0 +1,134 @@
+"""Граф подписок в кеше FEED_CACHE_ALIAS.
+
+Для каждого пользователя хранится отсортированный массив идентификаторов
+авторов, на которых он подписан (array('q') занимает 8 байт на подписку),
+и число его подписчиков. Проверка «подписан ли я», список подписок и
+взаимные подписки читаются из кеша без запросов к базе; промах загружает
+недостающих пользователей одним запросом к основной базе: отстающая
+реплика положила бы в кеш устаревший граф.
+
+Сигналы Follow удаляют массив подписчика (следующее чтение загрузит его
+заново) и атомарно меняют счётчик автора. bulk_create сигналов
+не отправляет — после него нужно вызвать forget().
+"""
+from array import array
+from bisect import bisect_left
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from .models import Follow, UserStats
+
+FOLLOWING_KEY = 'follow_graph:following:{}'
+FOLLOWERS_KEY = 'follow_graph:followers:{}'
+
+
+def _cache():
+    return caches[settings.FEED_CACHE_ALIAS]
+
+
+def _contains(ids, value):
+    index = bisect_left(ids, value)
+    return index < len(ids) and ids[index] == value
+
+
+def following_query(user_ids):
+    return Follow.objects.using(DEFAULT_DB_ALIAS).filter(
+        user_id__in=user_ids).order_by(
+        'user_id', 'author_id').values_list('user_id', 'author_id')
+
+
+def following_many(user_ids):
+    """{user_id: отсортированный array идентификаторов авторов}."""
+    cache = _cache()
+    keys = {FOLLOWING_KEY.format(user_id): user_id for user_id in user_ids}
+    found = {
+        keys[key]: ids for key, ids in cache.get_many(list(keys)).items()}
+    missing = set(keys.values()) - found.keys()
+    if missing:
+        loaded = {user_id: array('q') for user_id in missing}
+        for user_id, author_id in following_query(missing):
+            loaded[user_id].append(author_id)
+        cache.set_many({
+            FOLLOWING_KEY.format(user_id): ids
+            for user_id, ids in loaded.items()})
+        found.update(loaded)
+    return found
+
+
+def following(user_id):
+    return following_many([user_id])[user_id]
+
+
+def is_following(user_id, author_id):
+    if user_id is None or user_id == author_id:
+        return False
+    return _contains(following(user_id), author_id)
+
+
+def mutual(user_id):
+    """Авторы, на которых подписан пользователь и которые подписаны на него."""
+    authors = following(user_id)
+    graph = following_many(authors)
+    return [author_id for author_id in authors
+            if _contains(graph[author_id], user_id)]
+
+
+def followers_counts(author_ids):
+    cache = _cache()
+    keys = {FOLLOWERS_KEY.format(author_id): author_id
+            for author_id in author_ids}
+    found = {
+        keys[key]: count
+        for key, count in cache.get_many(list(keys)).items()}
+    missing = set(keys.values()) - found.keys()
+    if missing:
+        loaded = dict.fromkeys(missing, 0)
+        loaded.update(
+            UserStats.objects.using(DEFAULT_DB_ALIAS).filter(
+                user_id__in=missing).values_list(
+                    'user_id', 'followers_count'))
+        cache.set_many({
+            FOLLOWERS_KEY.format(author_id): count
+            for author_id, count in loaded.items()})
+        found.update(loaded)
+    return found
+
+
+def followers_count(author_id):
+    return followers_counts([author_id])[author_id]
+
+
+def _change_followers(author_id, delta):
+    try:
+        _cache().incr(FOLLOWERS_KEY.format(author_id), delta)
+    except ValueError:
+        # Счётчика нет в кеше — он загрузится из UserStats при чтении
+        pass
+
+
+def _forget_following(user_id):
+    # Массив не правится на месте: два одновременных get → set потеряли бы
+    # одну из подписок. Ключ удаляется сразу и ещё раз после коммита,
+    # чтобы чтение до коммита не вернуло в кеш старый граф
+    key = FOLLOWING_KEY.format(user_id)
+    _cache().delete(key)
+    transaction.on_commit(lambda: _cache().delete(key))
+
+
+def add(user_id, author_id):
+    _forget_following(user_id)
+    _change_followers(author_id, 1)
+
+
+def remove(user_id, author_id):
+    _forget_following(user_id)
+    _change_followers(author_id, -1)
+
+
+def forget(user_ids=(), author_ids=()):
+    """Сбросить закешированные подписки и счётчики после правок в обход ORM."""
+    _cache().delete_many(
+        [FOLLOWING_KEY.format(user_id) for user_id in user_ids]
+        + [FOLLOWERS_KEY.format(author_id) for author_id in author_ids])
@@ -0,0 +1,43 @@
+"""Подписка и отписка от многих авторов за один запрос.
+
+Подписки вставляются одним bulk_create(ignore_conflicts=True), который не
+отправляет сигналы, поэтому ленты, граф подписок и фрагменты обновляются
+здесь же пачкой, а счётчики пересчитываются по таблице подписок. Отписка
+идёт через обычный delete(): её сигналы делают то же, что и для одиночной
+отписки.
+"""
+from django.db import transaction
+
+from . import counters, follow_graph, fragments, timeline
+from .models import Follow
+
+
+@transaction.atomic
+def follow_many(user, author_ids):
+    """Подписать user на авторов; вернуть идентификаторы новых подписок."""
+    author_ids = set(author_ids) - {user.pk}
+    existing = Follow.objects.filter(
+        user=user, author_id__in=author_ids).values_list(
+        'author_id', flat=True)
+    new_ids = sorted(author_ids - set(existing))
+    if not new_ids:
+        return []
+    Follow.objects.bulk_create(
+        (Follow(user=user, author_id=author_id) for author_id in new_ids),
+        ignore_conflicts=True,
+    )
+    counters.recount_follows(user.pk, new_ids)
+    timeline.add_authors(user.pk, new_ids)
+    for author_id in new_ids:
+        follow_graph.add(user.pk, author_id)
+    fragments.bump(
+        f'follow:{user.pk}', f'profile:{user.pk}',
+        *(f'profile:{author_id}' for author_id in new_ids))
+    return new_ids
+
+
+@transaction.atomic
+def unfollow_many(user, author_ids):
+    deleted, _ = Follow.objects.filter(
+        user=user, author_id__in=author_ids).delete()
+    return deleted
@@ -1,5 +1,6 @@
 from django import forms
 
+from . import uploads
 from .models import Comment, Post
 
 
@@ -11,6 +12,14 @@ class PostForm(forms.ModelForm):
         # Добавили поле image в форму
         fields = ('group', 'text', 'image')
 
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        # Проверяем только новые загрузки, а не уже сохранённый файл
+        if not image or not hasattr(image, 'content_type'):
+            return image
+        uploads.validate(image)
+        return uploads.downscale(image)
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,88 @@
+"""Версионированный кеш фрагментов лент.
+
+Ключ фрагмента включает версии его областей: 'index', 'group:<id>',
+'profile:<id>', 'follow:<id>', 'post:<id>' и общую 'all'. Сигналы
+увеличивают версии при изменении постов, комментариев, групп и подписок,
+поэтому фрагменты живут долго и не отдают устаревшее содержимое —
+если кеш общий для всех процессов. С LocMemCache версия меняется только
+в процессе, где была запись, поэтому там фрагменты и версии живут
+FRAGMENT_CACHE_TTL (минуту вне DEBUG).
+
+Фрагмент, отрисованный по данным отстающей реплики (core/routers.py),
+мог попасть в кеш под уже новой версией, поэтому такие фрагменты
+хранятся не дольше DB_STICKY_SECONDS.
+"""
+import random
+
+from django.conf import settings
+from django.core.cache import caches
+
+from core.routers import reading_replica
+
+ALL = 'all'
+VERSION_KEY = 'fragments:version:{}'
+
+_random = random.SystemRandom()
+
+
+def _cache():
+    return caches[settings.FRAGMENT_CACHE_ALIAS]
+
+
+def _start_version():
+    # Версия — счётчик. Начинается со случайного числа, чтобы после
+    # вытеснения счётчика не совпасть с фрагментами под старыми версиями
+    return _random.getrandbits(48)
+
+
+def versions(*scopes):
+    cache = _cache()
+    keys = [VERSION_KEY.format(scope) for scope in (ALL, *scopes)]
+    known = cache.get_many(keys)
+    missing = [key for key in keys if key not in known]
+    if missing:
+        # add не перезапишет счётчик, заведённый параллельным запросом
+        for version_key in missing:
+            cache.add(version_key, _start_version(),
+                      timeout=settings.FRAGMENT_VERSION_TTL)
+        known.update(cache.get_many(missing))
+    return [known[key] for key in keys]
+
+
+def key(*scopes):
+    """Часть ключа {% cache %}, меняющаяся при изменении областей."""
+    scopes = (ALL, *scopes)
+    return '.'.join(
+        f'{scope}={version}'
+        for scope, version in zip(scopes, versions(*scopes[1:])))
+
+
+def bump(*scopes):
+    cache = _cache()
+    for scope in scopes:
+        version_key = VERSION_KEY.format(scope)
+        try:
+            cache.incr(version_key)
+        except ValueError:
+            cache.add(version_key, _start_version(),
+                      timeout=settings.FRAGMENT_VERSION_TTL)
+
+
+def post_scopes(post, old_group_id=None):
+    """Области, в которых виден пост."""
+    scopes = {'index', f'profile:{post.author_id}', f'post:{post.pk}'}
+    for group_id in (post.group_id, old_group_id):
+        if group_id is not None:
+            scopes.add(f'group:{group_id}')
+    return scopes
+
+
+def context(*scopes):
+    ttl = settings.FRAGMENT_CACHE_TTL
+    if reading_replica():
+        ttl = min(ttl, settings.DB_STICKY_SECONDS)
+    return {
+        'fragment_key': key(*scopes),
+        'fragment_ttl': ttl,
+        'fragment_cache': settings.FRAGMENT_CACHE_ALIAS,
+    }
@@ -0,0 +1,119 @@
+import json
+import time
+from contextlib import ExitStack
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import Count
+from django.test import Client
+from django.urls import reverse
+from django.utils.http import urlencode
+
+from core.metrics import nearest_rank
+from posts.models import Group, Post
+
+User = get_user_model()
+
+
+def targets():
+    """Страницы для замера: самые тяжёлые из имеющихся данных."""
+    author = User.objects.order_by('-stats__followers_count').first()
+    reader = User.objects.order_by('-stats__following_count').first()
+    group = Group.objects.annotate(
+        total=Count('posts')).order_by('-total').first()
+    post = Post.objects.order_by('-comments_count').first()
+    if not (author and reader and post):
+        raise CommandError('Нет данных: сначала запустите seed_data.')
+    urls = {
+        'index': reverse('posts:index'),
+        'index (стр. 50)': reverse('posts:index') + '?page=50',
+        'profile': reverse('posts:profile', args=[author.username]),
+        'post_detail': reverse('posts:post_detail', args=[post.pk]),
+        'follow_index': reverse('posts:follow_index'),
+        'search': reverse('posts:search') + '?' + urlencode(
+            {'q': post.text.split()[0]}),
+    }
+    if group:
+        urls['group_posts'] = reverse('posts:group_list', args=[group.slug])
+    return reader, urls
+
+
+class Command(BaseCommand):
+    help = ('Замеряет задержку и число SQL-запросов основных страниц '
+            'на текущих данных.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests', type=int, default=50,
+            help='Запросов к каждой странице.',
+        )
+        parser.add_argument(
+            '--warmup', type=int, default=3,
+            help='Запросов перед замером, которые не учитываются.',
+        )
+        parser.add_argument(
+            '--cold', action='store_true',
+            help='Очищать кеши перед каждым запросом.',
+        )
+        parser.add_argument(
+            '--json', dest='json_path',
+            help='Сохранить результаты в JSON для сравнения прогонов.',
+        )
+
+    def measure(self, client, url, options):
+        for _ in range(options['warmup']):
+            client.get(url)
+        timings, queries = [], []
+        for _ in range(options['requests']):
+            if options['cold']:
+                for cache in caches.all():
+                    cache.clear()
+            # Запросы к репликам тоже считаются; execute_wrapper, в отличие
+            # от CaptureQueriesContext, не открывает лишних соединений
+            executed = []
+
+            def count(execute, sql, params, many, context):
+                executed.append(sql)
+                return execute(sql, params, many, context)
+
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(count))
+                started = time.perf_counter()
+                response = client.get(url)
+                timings.append((time.perf_counter() - started) * 1000)
+            if response.status_code != 200:
+                raise CommandError(f'{url}: ответ {response.status_code}')
+            queries.append(len(executed))
+        return {
+            'url': url,
+            'p50': nearest_rank(timings, 0.5),
+            'p90': nearest_rank(timings, 0.9),
+            'p99': nearest_rank(timings, 0.99),
+            'max': max(timings),
+            'queries': max(queries),
+        }
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1:
+            raise CommandError('--requests должно быть больше нуля.')
+        reader, urls = targets()
+        client = Client(HTTP_HOST='localhost')
+        client.force_login(reader)
+        results = {}
+        self.stdout.write(
+            f'{"страница":<18}{"p50":>9}{"p90":>9}{"p99":>9}{"max":>9}'
+            f'{"SQL":>6}')
+        for name, url in urls.items():
+            result = results[name] = self.measure(client, url, options)
+            self.stdout.write(
+                f'{name:<18}' + ''.join(
+                    f'{result[key]:>9.1f}' for key in ('p50', 'p90', 'p99',
+                                                       'max'))
+                + f'{result["queries"]:>6}')
+        self.stdout.write('Время в миллисекундах.')
+        if options['json_path']:
+            with open(options['json_path'], 'w', encoding='utf-8') as stream:
+                json.dump(results, stream, ensure_ascii=False, indent=2)
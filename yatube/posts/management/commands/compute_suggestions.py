@@ -0,0 +1,28 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import suggestions
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает рекомендации «кого читать» по графу подписок. '
+            'Запускайте по расписанию, например раз в сутки из cron.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit', type=int, default=settings.SUGGESTIONS_PER_USER,
+            help='Рекомендаций на пользователя.',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Пользователей в одной транзакции.',
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        saved = suggestions.compute(options['limit'], options['batch_size'])
+        self.stdout.write(
+            f'Сохранено рекомендаций: {saved} '
+            f'за {time.monotonic() - started:.1f} с')
@@ -0,0 +1,86 @@
+import re
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from posts import comments, feeds, follow_graph, timeline
+from posts.models import Group, Post
+from posts.paginators import CursorPaginator
+from posts.views import NUM_OF_OBJ
+
+User = get_user_model()
+
+# Полный проход по таблице и сортировка во временном дереве
+# для SQLite (EXPLAIN QUERY PLAN) и PostgreSQL (EXPLAIN)
+PROBLEMS = (
+    (re.compile(r'\bSCAN (?:TABLE )?(\w+)$'), 'полный проход по {}'),
+    (re.compile(r'USE TEMP B-TREE FOR (.+)$'), 'временное дерево для {}'),
+    (re.compile(r'Seq Scan on (\w+)'), 'полный проход по {}'),
+    (re.compile(r'^\W*Sort\b()'), 'сортировка без индекса{}'),
+)
+
+
+def cursor_query(posts, **cursor_key):
+    """Страница курсорной пагинации после первой."""
+    paginator = CursorPaginator(posts, NUM_OF_OBJ, **cursor_key)
+    return paginator.queryset(paginator.cursor_for(timezone.now(), 0))
+
+
+def feed_queries():
+    """Запросы лент в том виде, в каком их выполняют представления."""
+    user = User.objects.first() or User(pk=0)
+    group = Group.objects.first() or Group(pk=0)
+    post = Post.objects.first() or Post(pk=0)
+    return {
+        'index': feeds.index_feed()[:NUM_OF_OBJ],
+        'group_posts': feeds.group_feed(group)[:NUM_OF_OBJ],
+        'profile': feeds.profile_feed(user)[:NUM_OF_OBJ],
+        'follow_graph': follow_graph.following_query([user.pk]),
+        'follow_index': feeds.follow_feed(user)[:NUM_OF_OBJ],
+        'index_cursor': cursor_query(feeds.index_feed()),
+        'group_posts_cursor': cursor_query(feeds.group_feed(group)),
+        'profile_cursor': cursor_query(feeds.profile_feed(user)),
+        'follow_index_cursor': cursor_query(
+            feeds.follow_feed(user), **timeline.cursor_key(user)),
+        'post_comments': post.comments.all(),
+        'post_detail_comments': comments.thread(post).order_by(
+            'created', 'pk')[:settings.COMMENTS_PER_PAGE],
+    }
+
+
+def find_problems(plan):
+    problems = []
+    for line in plan.splitlines():
+        for pattern, message in PROBLEMS:
+            match = pattern.search(line.strip())
+            if match:
+                problems.append(message.format(match.group(1)))
+    return problems
+
+
+class Command(BaseCommand):
+    help = 'Выводит планы запросов лент и сообщает о полных проходах.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fail', action='store_true',
+            help='Завершиться с ошибкой, если найдены проблемы.',
+        )
+
+    def handle(self, *args, **options):
+        total = 0
+        for name, queryset in feed_queries().items():
+            plan = queryset.explain()
+            problems = find_problems(plan)
+            total += len(problems)
+            status = self.style.WARNING('WARN') if problems else (
+                self.style.SUCCESS('OK'))
+            self.stdout.write(f'{status} {name}')
+            if options['verbosity'] > 1:
+                self.stdout.write(plan)
+            for problem in problems:
+                self.stdout.write(f'    {problem}')
+        if total and options['fail']:
+            raise CommandError(f'Неоптимальных мест в планах: {total}')
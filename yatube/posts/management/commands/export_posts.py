@@ -0,0 +1,45 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import transfer
+from posts.models import Post
+
+
+def file_format(path, fmt):
+    if fmt:
+        return fmt
+    return 'csv' if path.endswith('.csv') else 'jsonl'
+
+
+class Command(BaseCommand):
+    help = 'Выгружает посты в JSONL или CSV, не загружая их все в память.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?', default='-',
+            help='Файл; «-» — стандартный вывод.',
+        )
+        parser.add_argument(
+            '--format', choices=sorted(transfer.WRITERS),
+            help='Формат; по умолчанию — по расширению файла.',
+        )
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        write = transfer.WRITERS[file_format(path, options['format'])]
+        rows = transfer.export_rows(
+            Post.objects.all(), chunk_size=options['batch_size'])
+        started = time.monotonic()
+        if path == '-':
+            exported = sum(1 for _ in write(rows, sys.stdout))
+        else:
+            with open(path, 'w', newline='', encoding='utf-8') as stream:
+                exported = sum(1 for _ in write(rows, stream))
+        elapsed = time.monotonic() - started
+        # Отчёт в stderr: stdout может быть самим файлом выгрузки
+        self.stderr.write(
+            f'Выгружено постов: {exported} за {elapsed:.1f} с '
+            f'({exported / max(elapsed, 1e-6):.0f} в секунду)')
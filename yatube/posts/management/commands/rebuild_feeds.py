@@ -0,0 +1,36 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from posts import timeline
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает материализованные ленты подписок.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'usernames', nargs='*',
+            help='Пользователи; по умолчанию — все, у кого есть подписки.',
+        )
+        parser.add_argument(
+            '--fanout-only', action='store_true',
+            help='Только перевести авторов между раздачей и чтением '
+                 'на лету.',
+        )
+
+    def handle(self, *args, **options):
+        pulled, pushed = timeline.sync_fanout()
+        self.stdout.write(
+            f'Стали читаться на лету: {pulled}, снова раздаются: {pushed}')
+        if options['fanout_only']:
+            return
+        users = User.objects.filter(follower__isnull=False).distinct()
+        if options['usernames']:
+            users = User.objects.filter(username__in=options['usernames'])
+        rebuilt = 0
+        for user_id in users.values_list('pk', flat=True).iterator():
+            timeline.rebuild(user_id)
+            rebuilt += 1
+        self.stdout.write(f'Пересобрано лент: {rebuilt}')
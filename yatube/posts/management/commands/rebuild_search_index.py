@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from posts import search_index
+
+
+class Command(BaseCommand):
+    help = 'Строит поисковый индекс постов и комментариев заново.'
+
+    def handle(self, *args, **options):
+        indexed = search_index.rebuild()
+        backend = 'FTS5' if search_index.use_fts5() else 'обратный индекс'
+        self.stdout.write(f'Проиндексировано текстов: {indexed} ({backend})')
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from posts import counters
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает денормализованные счётчики постов и подписок.'
+
+    def handle(self, *args, **options):
+        users = counters.recount_users()
+        posts = counters.recount_posts()
+        self.stdout.write(
+            f'Исправлено счётчиков: пользователей {users}, постов {posts}')
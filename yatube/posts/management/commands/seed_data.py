@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import seeding
+
+
+class Command(BaseCommand):
+    help = ('Создаёт пользователей, группы, посты, комментарии и подписки '
+            'для нагрузочного тестирования.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--groups', type=int, default=10)
+        parser.add_argument('--posts', type=int, default=1000)
+        parser.add_argument('--comments', type=int, default=2000)
+        parser.add_argument('--follows', type=int, default=500)
+        parser.add_argument(
+            '--days', type=int, default=365,
+            help='За сколько последних дней распределить посты.',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--seed', type=int, help='Зерно генератора для повторяемости.')
+        parser.add_argument(
+            '--no-index', action='store_true',
+            help='Не пересобирать поисковый индекс.',
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        created = seeding.seed(
+            users=options['users'], groups=options['groups'],
+            posts=options['posts'], comments=options['comments'],
+            follows=options['follows'], days=options['days'],
+            batch_size=options['batch_size'], seed=options['seed'],
+            index=not options['no_index'],
+        )
+        summary = ', '.join(f'{name} {count}' for name, count in
+                            created.items())
+        self.stdout.write(
+            f'Создано: {summary} за {time.monotonic() - started:.1f} с. '
+            f'Пароль пользователей: {seeding.PASSWORD}')
@@ -0,0 +1,45 @@
+# Generated by Django 2.2.16 on 2026-10-17 05:46
+
+from django.db import migrations, models
+
+
+def remove_duplicate_follows(apps, schema_editor):
+    # Перед уникальным ограничением оставляем по одной подписке на пару
+    Follow = apps.get_model('posts', 'Follow')
+    seen = set()
+    duplicates = []
+    pairs = Follow.objects.order_by('pk').values_list(
+        'pk', 'user_id', 'author_id')
+    for pk, user_id, author_id in pairs.iterator():
+        if (user_id, author_id) in seen:
+            duplicates.append(pk)
+        seen.add((user_id, author_id))
+    Follow.objects.filter(pk__in=duplicates).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0006_feedentry'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-pub_date'], name='posts_post_pub_dat_efcc38_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author', '-pub_date'], name='posts_post_author__7827da_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['group', '-pub_date'], name='posts_post_group_i_1fdac4_idx'),
+        ),
+        migrations.RunPython(
+            remove_duplicate_follows, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.UniqueConstraint(fields=('user', 'author'), name='unique_follow'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+from itertools import islice
+
+from django.conf import settings
+from django.db import migrations
+from django.db.models import Count
+
+
+def fill_feed_entries(apps, schema_editor):
+    # Ленты подписок, созданных до FeedEntry, собираются так же, как
+    # timeline.rebuild: последние FEED_BACKFILL_SIZE постов каждого автора
+    # под FEED_FANOUT_LIMIT, по FEED_BATCH_SIZE записей за раз
+    Follow = apps.get_model('posts', 'Follow')
+    Post = apps.get_model('posts', 'Post')
+    FeedEntry = apps.get_model('posts', 'FeedEntry')
+    authors = Follow.objects.values('author_id').annotate(
+        total=Count('pk')).order_by('author_id')
+    if settings.FEED_FANOUT_LIMIT is not None:
+        authors = authors.filter(total__lte=settings.FEED_FANOUT_LIMIT)
+
+    def entries():
+        for author_id in authors.values_list('author_id', flat=True):
+            posts = list(
+                Post.objects.filter(author_id=author_id)
+                .order_by('-pub_date').values_list('pk', 'pub_date')
+                [:settings.FEED_BACKFILL_SIZE])
+            followers = Follow.objects.filter(
+                author_id=author_id).values_list('user_id', flat=True)
+            for user_id in followers.iterator():
+                for pk, pub_date in posts:
+                    yield FeedEntry(
+                        user_id=user_id, post_id=pk, pub_date=pub_date)
+
+    rows = entries()
+    while True:
+        batch = list(islice(rows, settings.FEED_BATCH_SIZE))
+        if not batch:
+            return
+        FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_cursor_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_feed_entries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 2.2.16 on 2026-10-17 06:54
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def mark_pulled_authors(apps, schema_editor):
+    # Раньше авторы над FEED_FANOUT_LIMIT определялись по числу подписок
+    if settings.FEED_FANOUT_LIMIT is None:
+        return
+    Follow = apps.get_model('posts', 'Follow')
+    UserStats = apps.get_model('posts', 'UserStats')
+    authors = Follow.objects.values('author_id').annotate(
+        total=Count('pk')).filter(
+        total__gt=settings.FEED_FANOUT_LIMIT).values('author_id')
+    UserStats.objects.filter(user_id__in=authors).update(feed_pulled=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_fill_feed_entries'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userstats',
+            name='feed_pulled',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(mark_pulled_authors, migrations.RunPython.noop),
+    ]
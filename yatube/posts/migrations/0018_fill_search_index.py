@@ -0,0 +1,63 @@
+from collections import Counter
+from itertools import chain, islice
+
+from django.conf import settings
+from django.db import migrations
+
+from posts.search_index import FTS_TABLE, terms
+
+
+def fill_search_index(apps, schema_editor):
+    # Посты и комментарии, написанные до 0011_search, индексируются так же,
+    # как posts/search_index.py: в FTS5, если таблица есть, иначе в SearchTerm
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    SearchTerm = apps.get_model('posts', 'SearchTerm')
+    connection = schema_editor.connection
+    texts = chain(
+        ((post_id, None, text) for post_id, text in Post.objects.order_by(
+            'pk').values_list('pk', 'text').iterator()),
+        Comment.objects.order_by('pk').values_list(
+            'post_id', 'pk', 'text').iterator(),
+    )
+    use_fts5 = (settings.SEARCH_BACKEND == 'auto'
+                and FTS_TABLE in connection.introspection.table_names())
+    if use_fts5:
+        # rowid как в search_index._rowid: посты чётные, комментарии нечётные
+        rows = (
+            (post_id * 2 if comment_id is None else comment_id * 2 + 1,
+             ' '.join(terms(text)), post_id)
+            for post_id, comment_id, text in texts
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+            while True:
+                batch = list(islice(rows, settings.FEED_BATCH_SIZE))
+                if not batch:
+                    return
+                cursor.executemany(
+                    f'INSERT INTO {FTS_TABLE} (rowid, body, post_id) '
+                    'VALUES (%s, %s, %s)', batch)
+    SearchTerm.objects.all().delete()
+    rows = (
+        SearchTerm(term=term, post_id=post_id, comment_id=comment_id,
+                   count=min(count, 32767))
+        for post_id, comment_id, text in texts
+        for term, count in Counter(terms(text)).items()
+    )
+    while True:
+        batch = list(islice(rows, settings.FEED_BATCH_SIZE))
+        if not batch:
+            return
+        SearchTerm.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_userstats_feed_pulled'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_search_index, migrations.RunPython.noop),
+    ]
@@ -38,15 +38,79 @@ class Post(models.Model):
     )
     # Аргумент upload_to указывает директорию,
     # в которую будут загружаться пользовательские файлы.
+    # URL миниатюры, которую готовит фоновый пул, см. posts/thumbnails.py
+    thumbnail = models.CharField(max_length=255, blank=True, editable=False)
+    # Счётчик обновляется сигналами, см. posts/counters.py
+    comments_count = models.PositiveIntegerField(default=0, editable=False)
 
     class Meta:
         ordering = [
             '-pub_date',
         ]
+        indexes = [
+            # -id совпадает с вторым ключом курсорной пагинации
+            models.Index(fields=['-pub_date', '-id']),
+            models.Index(fields=['author', '-pub_date', '-id']),
+            models.Index(fields=['group', '-pub_date', '-id']),
+        ]
 
     def __str__(self):
         return self.text[:15]
 
+    def _srcsets(self):
+        # Варианты должны быть предзагружены, см. posts/feeds.py
+        srcsets = {}
+        for variant in self.image_variants.all():
+            srcsets.setdefault(variant.format, []).append(
+                f'{variant.url} {variant.width}w')
+        return {fmt: ', '.join(items) for fmt, items in srcsets.items()}
+
+    @property
+    def image_sources(self):
+        """Пары (MIME-тип, srcset) современных форматов для <picture>."""
+        srcsets = self._srcsets()
+        return [
+            (f'image/{fmt}', srcsets[fmt])
+            for fmt in PostImageVariant.MODERN_FORMATS if fmt in srcsets
+        ]
+
+    @property
+    def image_srcset(self):
+        return self._srcsets().get(PostImageVariant.JPEG, '')
+
+
+class PostImageVariant(models.Model):
+    """Уменьшенная копия картинки поста заданной ширины и формата."""
+    AVIF = 'avif'
+    WEBP = 'webp'
+    JPEG = 'jpeg'
+    FORMATS = (
+        (AVIF, 'AVIF'),
+        (WEBP, 'WebP'),
+        (JPEG, 'JPEG'),
+    )
+    # В порядке предпочтения для <source>
+    MODERN_FORMATS = (AVIF, WEBP)
+
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='image_variants',
+    )
+    width = models.PositiveSmallIntegerField()
+    format = models.CharField(max_length=4, choices=FORMATS)
+    url = models.CharField(max_length=255)
+
+    class Meta:
+        ordering = [
+            'width',
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['post', 'width', 'format'],
+                name='unique_post_image_variant'),
+        ]
+
 
 class Comment(models.Model):
     post = models.ForeignKey(
@@ -61,6 +125,25 @@ class Comment(models.Model):
     )
     text = models.TextField('Текст комментария')
     created = models.DateTimeField(auto_now_add=True)
+    # Ответ на комментарий; глубина ограничена, см. posts/comments.py
+    parent = models.ForeignKey(
+        'self',
+        on_delete=models.CASCADE,
+        blank=True,
+        null=True,
+        related_name='replies',
+        verbose_name='Ответ на',
+    )
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
+
+    class Meta:
+        ordering = [
+            'created', 'id',
+        ]
+        indexes = [
+            models.Index(fields=['post', 'created']),
+            models.Index(fields=['post', 'parent', 'created']),
+        ]
 
     def __str__(self):
         return self.text
@@ -77,3 +160,104 @@ class Follow(models.Model):
         on_delete=models.CASCADE,
         related_name='following',
     )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'], name='unique_follow'),
+        ]
+
+
+class UserStats(models.Model):
+    """Денормализованные счётчики пользователя, см. posts/counters.py"""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+    )
+    posts_count = models.PositiveIntegerField(default=0)
+    followers_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+    # Посты автора не раздаются, а читаются на лету (posts/timeline.py)
+    feed_pulled = models.BooleanField(default=False)
+
+
+class FeedEntry(models.Model):
+    """Материализованная лента подписок: пост, разосланный читателю."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+    )
+    # Копия post.pub_date, чтобы лента читалась одним диапазоном индекса
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        ordering = [
+            '-pub_date',
+        ]
+        indexes = [
+            models.Index(fields=['user', '-pub_date', '-post']),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'], name='unique_feed_entry'),
+        ]
+
+
+class SearchTerm(models.Model):
+    """Обратный индекс поиска без FTS5, см. posts/search_index.py"""
+    term = models.CharField(max_length=64)
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    # Пусто для терминов из текста самого поста
+    comment = models.ForeignKey(
+        Comment,
+        on_delete=models.CASCADE,
+        null=True,
+        related_name='+',
+    )
+    count = models.PositiveSmallIntegerField(default=1)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['term', 'post']),
+        ]
+
+
+class FollowSuggestion(models.Model):
+    """Рекомендация «кого читать», см. posts/suggestions.py"""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='follow_suggestions',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    score = models.FloatField()
+    # Сколько подписок пользователя читают этого автора
+    friends = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = [
+            '-score',
+        ]
+        indexes = [
+            models.Index(fields=['user', '-score']),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'], name='unique_follow_suggestion'),
+        ]
@@ -0,0 +1,165 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections.abc import Sequence
+from types import SimpleNamespace
+
+from django.core.exceptions import ValidationError
+from django.db.models import F, Q
+from django.db.models.constants import LOOKUP_SEP
+
+NEXT = 'n'
+PREVIOUS = 'p'
+# Псевдонимы ключей, которые лежат за связью
+KEY_ALIASES = ('cursor_value', 'cursor_pk')
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+class CursorPaginator:
+    """Постраничный вывод по ключу (field, tiebreaker) без COUNT(*) и OFFSET.
+
+    Каждая страница — это один запрос вида
+    WHERE (field, pk) < (value, pk) ORDER BY field DESC, pk DESC LIMIT n + 1,
+    поэтому её стоимость не зависит от глубины. Ключ может лежать за
+    связью (field='feed_entries__pub_date'), чтобы сортировка совпадала
+    с индексом, по которому выборку читает вызывающий код. Значение
+    tiebreaker должно совпадать с pk объекта.
+    """
+
+    def __init__(self, object_list, per_page, field='pub_date',
+                 descending=True, tiebreaker='pk'):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.field = field
+        self.tiebreaker = tiebreaker
+        self.descending = descending
+
+    def _model_field(self):
+        model = self.object_list.model
+        *relations, name = self.field.split(LOOKUP_SEP)
+        for relation in relations:
+            model = model._meta.get_field(relation).related_model
+        return model._meta.get_field(name)
+
+    def _keys(self):
+        # Повторный filter() по многозначной связи добавил бы второй JOIN,
+        # поэтому ключи за связью читаются аннотациями
+        queryset = self.object_list
+        keys = []
+        for name, alias in zip((self.field, self.tiebreaker), KEY_ALIASES):
+            if LOOKUP_SEP in name:
+                queryset = queryset.annotate(**{alias: F(name)})
+                name = alias
+            keys.append(name)
+        return queryset, keys
+
+    def cursor_for(self, value, pk, direction=NEXT):
+        field = self._model_field()
+        value = field.value_to_string(
+            SimpleNamespace(**{field.attname: value}))
+        raw = f'{direction}|{value}|{pk}'.encode()
+        return urlsafe_b64encode(raw).decode().rstrip('=')
+
+    def encode_cursor(self, obj, direction):
+        if LOOKUP_SEP in self.field:
+            value = getattr(obj, KEY_ALIASES[0])
+        else:
+            value = getattr(obj, self._model_field().attname)
+        return self.cursor_for(value, obj.pk, direction)
+
+    def decode_cursor(self, cursor):
+        try:
+            padding = '=' * (-len(cursor) % 4)
+            raw = urlsafe_b64decode(cursor + padding).decode()
+            direction, value, pk = raw.split('|')
+            value = self._model_field().to_python(value)
+            pk = int(pk)
+        except (TypeError, ValueError, ValidationError) as error:
+            raise InvalidCursor(cursor) from error
+        if direction not in (NEXT, PREVIOUS) or value is None:
+            raise InvalidCursor(cursor)
+        return direction, value, pk
+
+    def queryset(self, cursor=None):
+        """Запрос страницы: per_page + 1 строк после курсора."""
+        direction = NEXT
+        queryset, (field, tiebreaker) = self._keys()
+        if cursor:
+            direction, value, pk = self.decode_cursor(cursor)
+        forward = direction == NEXT
+        descending = self.descending if forward else not self.descending
+        prefix = '-' if descending else ''
+        if cursor:
+            lookup = 'lt' if descending else 'gt'
+            # Отдельное условие field <= value даёт диапазон индекса,
+            # с одним OR база собирала бы строки и сортировала заново
+            queryset = queryset.filter(
+                Q(**{f'{field}__{lookup}e': value}),
+                Q(**{f'{field}__{lookup}': value})
+                | Q(**{f'{tiebreaker}__{lookup}': pk}),
+            )
+        queryset = queryset.order_by(prefix + field, prefix + tiebreaker)
+        return queryset[:self.per_page + 1]
+
+    def page(self, cursor=None):
+        rows = list(self.queryset(cursor))
+        forward = not cursor or self.decode_cursor(cursor)[0] == NEXT
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if forward:
+            has_next, has_previous = has_more, bool(cursor)
+        else:
+            rows.reverse()
+            has_next, has_previous = True, has_more
+        return CursorPage(rows, self, cursor or '', has_next, has_previous)
+
+    def get_page(self, cursor=None):
+        """Как Paginator.get_page: битый курсор отдаёт первую страницу."""
+        try:
+            return self.page(cursor)
+        except InvalidCursor:
+            return self.page()
+
+
+class CursorPage(Sequence):
+    cursor_based = True
+
+    def __init__(self, object_list, paginator, cursor, has_next,
+                 has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.cursor = cursor
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __repr__(self):
+        return f'<Cursor page {self.cursor or "first"}>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next and bool(self.object_list)
+
+    def has_previous(self):
+        return self._has_previous and bool(self.object_list)
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    @property
+    def next_cursor(self):
+        if self.has_next():
+            return self.paginator.encode_cursor(self.object_list[-1], NEXT)
+        return ''
+
+    @property
+    def previous_cursor(self):
+        if self.has_previous():
+            return self.paginator.encode_cursor(
+                self.object_list[0], PREVIOUS)
+        return ''
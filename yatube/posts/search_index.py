@@ -0,0 +1,167 @@
+"""Полнотекстовый поиск по постам и комментариям.
+
+Тексты разбиваются на основы слов русским стеммером (posts/stemmer.py)
+и попадают в таблицу SQLite FTS5 с ранжированием bm25. Если FTS5 нет
+(другая СУБД или SQLite без расширения), используется обратный индекс
+SearchTerm. Индекс обновляется сигналами при сохранении и удалении,
+manage.py rebuild_search_index строит его заново.
+"""
+import re
+from collections import Counter
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, Sum
+
+from .models import Comment, Post, SearchTerm
+from .stemmer import stem
+
+FTS_TABLE = 'posts_search_fts'
+WORD = re.compile(r'\w+')
+# Совпадение в тексте поста весит больше, чем в комментарии
+POST_WEIGHT = 2
+# Сколько совпадений FTS5 читается на одно место в выдаче
+CANDIDATES_PER_RESULT = 5
+
+
+def terms(text):
+    return [stem(word)[:64] for word in WORD.findall(text.lower())]
+
+
+@lru_cache(maxsize=None)
+def _fts5_compiled(vendor):
+    if vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        return bool(cursor.fetchone()[0])
+
+
+def use_fts5():
+    if settings.SEARCH_BACKEND != 'auto':
+        return False
+    return _fts5_compiled(connection.vendor)
+
+
+def _rowid(post_id=None, comment_id=None):
+    # Посты и комментарии делят rowid таблицы FTS: чётные и нечётные
+    if comment_id is not None:
+        return comment_id * 2 + 1
+    return post_id * 2
+
+
+def _index(text, post_id, comment_id=None):
+    words = terms(text)
+    if use_fts5():
+        rowid = _rowid(post_id, comment_id)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [rowid])
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, body, post_id) '
+                'VALUES (%s, %s, %s)',
+                [rowid, ' '.join(words), post_id],
+            )
+        return
+    SearchTerm.objects.filter(
+        post_id=post_id, comment_id=comment_id).delete()
+    SearchTerm.objects.bulk_create(
+        SearchTerm(term=term, post_id=post_id, comment_id=comment_id,
+                   count=min(count, 32767))
+        for term, count in Counter(words).items()
+    )
+
+
+def _remove(post_id=None, comment_id=None):
+    # Строки SearchTerm удаляются каскадом вместе с постом или комментарием
+    if use_fts5():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                [_rowid(post_id, comment_id)],
+            )
+
+
+def index_post(post):
+    _index(post.text, post.pk)
+
+
+def index_comment(comment):
+    _index(comment.text, comment.post_id, comment.pk)
+
+
+def remove_post(post_id):
+    _remove(post_id=post_id)
+
+
+def remove_comment(comment_id):
+    _remove(comment_id=comment_id)
+
+
+def clear():
+    if use_fts5():
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+    SearchTerm.objects.all().delete()
+
+
+@transaction.atomic
+def rebuild():
+    clear()
+    indexed = 0
+    for post in Post.objects.only('pk', 'text').iterator():
+        index_post(post)
+        indexed += 1
+    for comment in Comment.objects.only(
+            'pk', 'post_id', 'text').order_by().iterator():
+        index_comment(comment)
+        indexed += 1
+    return indexed
+
+
+def _fts5_post_ids(words, limit):
+    query = ' '.join(
+        '"{}"'.format(word.replace('"', '""')) for word in words)
+    # bm25 нельзя агрегировать в SQL, поэтому лучшие совпадения
+    # складываются по постам здесь; bm25 тем лучше, чем меньше
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT post_id, rowid %% 2, bm25({FTS_TABLE}) '
+            f'FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+            f'ORDER BY bm25({FTS_TABLE}) LIMIT %s',
+            [query, limit * CANDIDATES_PER_RESULT],
+        )
+        rows = cursor.fetchall()
+    scores = Counter()
+    for post_id, is_comment, score in rows:
+        scores[post_id] += score if is_comment else score * POST_WEIGHT
+    ranked = sorted(scores, key=lambda post_id: (scores[post_id], -post_id))
+    return ranked[:limit]
+
+
+def _inverted_post_ids(words, limit):
+    # Как и в FTS5, все слова запроса должны встретиться в одном тексте
+    rows = (
+        SearchTerm.objects.filter(term__in=words)
+        .values('post_id', 'comment_id')
+        .annotate(matched=Count('term', distinct=True), score=Sum('count'))
+        .filter(matched=len(words))
+        .values_list('post_id', 'comment_id', 'score')
+    )
+    scores = Counter()
+    for post_id, comment_id, score in rows.iterator():
+        scores[post_id] += score if comment_id else score * POST_WEIGHT
+    ranked = sorted(scores, key=lambda post_id: (-scores[post_id], -post_id))
+    return ranked[:limit]
+
+
+def post_ids(query, limit=None):
+    """Идентификаторы найденных постов, лучшие первыми."""
+    words = sorted(set(terms(query)))
+    if not words:
+        return []
+    limit = limit or settings.SEARCH_MAX_RESULTS
+    if use_fts5():
+        return _fts5_post_ids(words, limit)
+    return _inverted_post_ids(words, limit)
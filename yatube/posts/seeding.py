@@ -0,0 +1,134 @@
+"""Генерация данных для нагрузочного тестирования.
+
+Популярность авторов, постов и групп распределена по закону Ципфа:
+немногие авторы пишут большую часть постов и собирают большую часть
+подписчиков, как в живой соцсети. Всё пишется пачками через bulk_create,
+поэтому после генерации пересчитываются счётчики, ленты и поиск.
+"""
+import random
+from datetime import timedelta
+from itertools import accumulate, islice
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+from faker import Faker
+
+from . import counters, follow_graph, search_index, timeline
+from .models import Comment, Follow, Group, Post
+from .transfer import keep_dates, keep_pub_date
+
+User = get_user_model()
+
+PASSWORD = 'yatube-seed'
+
+
+class Zipf:
+    """Выбор элементов с весом 1 / ранг ** skew."""
+
+    def __init__(self, items, rng, skew=1.1):
+        self.items = list(items)
+        self.rng = rng
+        self.weights = list(accumulate(
+            1 / rank ** skew for rank in range(1, len(self.items) + 1)))
+
+    def choice(self):
+        return self.rng.choices(self.items, cum_weights=self.weights)[0]
+
+
+def _bulk(model, objects, batch_size):
+    # Объекты создаются лениво и не копятся в памяти целиком
+    objects = iter(objects)
+    total = 0
+    while True:
+        batch = list(islice(objects, batch_size))
+        if not batch:
+            return total
+        model.objects.bulk_create(batch)
+        total += len(batch)
+
+
+def _between(start, end, rng):
+    return start + (end - start) * rng.random()
+
+
+@transaction.atomic
+def seed(users=100, groups=10, posts=1000, comments=2000, follows=500,
+         days=365, batch_size=1000, seed=None, index=True):
+    """Создать данные и вернуть словарь с числом созданных объектов."""
+    rng = random.Random(seed)
+    fake = Faker('ru_RU')
+    fake.seed_instance(seed)
+    prefix = f'seed{rng.randrange(10 ** 6)}'
+    created = {}
+
+    # Один хеш на всех: make_password на каждого пользователя очень долгий
+    password = make_password(PASSWORD)
+    created['users'] = _bulk(User, (
+        User(username=f'{prefix}_{i}', first_name=fake.first_name(),
+             last_name=fake.last_name(), password=password)
+        for i in range(users)
+    ), batch_size)
+    user_ids = list(User.objects.filter(
+        username__startswith=f'{prefix}_').values_list('pk', flat=True))
+    rng.shuffle(user_ids)
+
+    created['groups'] = _bulk(Group, (
+        Group(title=fake.catch_phrase()[:200], slug=f'{prefix}-{i}',
+              description=fake.paragraph())
+        for i in range(groups)
+    ), batch_size)
+    group_ids = list(Group.objects.filter(
+        slug__startswith=f'{prefix}-').values_list('pk', flat=True))
+
+    authors = Zipf(user_ids, rng)
+    topics = Zipf(group_ids + [None] * max(1, len(group_ids) // 2), rng)
+    now = timezone.now()
+    with keep_pub_date():
+        created['posts'] = _bulk(Post, (
+            Post(text=fake.text(rng.randint(50, 600)),
+                 author_id=authors.choice(), group_id=topics.choice(),
+                 pub_date=now - timedelta(seconds=rng.randrange(
+                     days * 24 * 3600)))
+            for _ in range(posts)
+        ), batch_size)
+
+    pub_dates = dict(Post.objects.filter(
+        author_id__in=user_ids).values_list('pk', 'pub_date'))
+    post_ids = list(pub_dates)
+    rng.shuffle(post_ids)
+    if post_ids:
+        popular = Zipf(post_ids, rng)
+        with keep_dates(Comment, 'created'):
+            # Комментарий оставлен между публикацией поста и концом диапазона
+            created['comments'] = _bulk(Comment, (
+                Comment(post_id=post_id, author_id=rng.choice(user_ids),
+                        text=fake.sentence(rng.randint(3, 25)),
+                        created=_between(pub_dates[post_id], now, rng))
+                for post_id in (popular.choice() for _ in range(comments))
+            ), batch_size)
+
+    edges = set()
+    attempts = 0
+    limit = min(follows, len(user_ids) * (len(user_ids) - 1))
+    while len(edges) < limit and attempts < limit * 20:
+        attempts += 1
+        edge = (rng.choice(user_ids), authors.choice())
+        if edge[0] != edge[1]:
+            edges.add(edge)
+    created['follows'] = _bulk(Follow, (
+        Follow(user_id=user_id, author_id=author_id)
+        for user_id, author_id in edges
+    ), batch_size)
+
+    # bulk_create не отправляет сигналы
+    counters.recount_users()
+    follow_graph.forget(user_ids, user_ids)
+    counters.recount_posts()
+    for user_id in {user_id for user_id, _ in edges}:
+        timeline.rebuild(user_id)
+    timeline.sync_fanout()
+    if index:
+        search_index.rebuild()
+    return created
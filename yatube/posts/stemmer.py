@@ -0,0 +1,121 @@
+"""Стеммер русского языка по алгоритму Snowball (Портер).
+
+https://snowballstem.org/algorithms/russian/stemmer.html
+"""
+import re
+from functools import lru_cache
+
+VOWELS = 'аеиоуыэюя'
+
+# Окончания первой группы удаляются только после «а» или «я»
+PERFECTIVE_GERUND = (
+    ('в', 'вши', 'вшись'),
+    ('ив', 'ивши', 'ившись', 'ыв', 'ывши', 'ывшись'),
+)
+ADJECTIVE = (
+    (),
+    ('ее', 'ие', 'ые', 'ое', 'ими', 'ыми', 'ей', 'ий', 'ый', 'ой', 'ем',
+     'им', 'ым', 'ом', 'его', 'ого', 'ему', 'ому', 'их', 'ых', 'ую', 'юю',
+     'ая', 'яя', 'ою', 'ею'),
+)
+PARTICIPLE = (
+    ('ем', 'нн', 'вш', 'ющ', 'щ'),
+    ('ивш', 'ывш', 'ующ'),
+)
+REFLEXIVE = (
+    (),
+    ('ся', 'сь'),
+)
+VERB = (
+    ('ла', 'на', 'ете', 'йте', 'ли', 'й', 'л', 'ем', 'н', 'ло', 'но', 'ет',
+     'ют', 'ны', 'ть', 'ешь', 'нно'),
+    ('ила', 'ыла', 'ена', 'ейте', 'уйте', 'ите', 'или', 'ыли', 'ей', 'уй',
+     'ил', 'ыл', 'им', 'ым', 'ен', 'ило', 'ыло', 'ено', 'ят', 'ует', 'уют',
+     'ит', 'ыт', 'ены', 'ить', 'ыть', 'ишь', 'ую', 'ю'),
+)
+NOUN = (
+    (),
+    ('а', 'ев', 'ов', 'ие', 'ье', 'е', 'иями', 'ями', 'ами', 'еи', 'ии',
+     'и', 'ией', 'ей', 'ой', 'ий', 'й', 'иям', 'ям', 'ием', 'ем', 'ам', 'ом',
+     'о', 'у', 'ах', 'иях', 'ях', 'ы', 'ь', 'ию', 'ью', 'ю', 'ия', 'ья',
+     'я'),
+)
+SUPERLATIVE = (
+    (),
+    ('ейш', 'ейше'),
+)
+DERIVATIONAL = (
+    (),
+    ('ост', 'ость'),
+)
+
+
+def _regions(word):
+    """Начала областей RV и R2."""
+    def after_vowel_consonant(start):
+        for i in range(start + 1, len(word)):
+            if word[i] not in VOWELS and word[i - 1] in VOWELS:
+                return i + 1
+        return len(word)
+
+    match = re.search(f'[{VOWELS}]', word)
+    rv = match.end() if match else len(word)
+    r1 = after_vowel_consonant(0)
+    r2 = after_vowel_consonant(r1)
+    return rv, r2
+
+
+@lru_cache(maxsize=None)
+def _endings(groups):
+    """Окончания групп от самых длинных к коротким."""
+    endings = [(ending, 0) for ending in groups[0]]
+    endings += [(ending, 1) for ending in groups[1]]
+    return sorted(endings, key=lambda item: len(item[0]), reverse=True)
+
+
+def _strip(word, start, groups):
+    """Удалить самое длинное окончание из групп в области от start."""
+    for ending, group in _endings(groups):
+        if not word.endswith(ending):
+            continue
+        cut = len(word) - len(ending)
+        if cut < start:
+            return word, False
+        if group == 0 and not (cut - 1 >= start and word[cut - 1] in 'ая'):
+            return word, False
+        return word[:cut], True
+    return word, False
+
+
+# Словоформы в текстах повторяются, поэтому основы кешируются
+@lru_cache(maxsize=100_000)
+def stem(word):
+    word = word.lower().replace('ё', 'е')
+    rv, r2 = _regions(word)
+
+    # Шаг 1
+    word, found = _strip(word, rv, PERFECTIVE_GERUND)
+    if not found:
+        word, _ = _strip(word, rv, REFLEXIVE)
+        word, found = _strip(word, rv, ADJECTIVE)
+        if found:
+            word, _ = _strip(word, rv, PARTICIPLE)
+        else:
+            word, found = _strip(word, rv, VERB)
+            if not found:
+                word, _ = _strip(word, rv, NOUN)
+
+    # Шаг 2
+    if word.endswith('и') and len(word) - 1 >= rv:
+        word = word[:-1]
+
+    # Шаг 3
+    word, _ = _strip(word, r2, DERIVATIONAL)
+
+    # Шаг 4
+    word, found = _strip(word, rv, SUPERLATIVE)
+    if word.endswith('нн') and len(word) - 2 >= rv:
+        word = word[:-1]
+    elif not found and word.endswith('ь') and len(word) - 1 >= rv:
+        word = word[:-1]
+    return word
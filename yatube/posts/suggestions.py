@@ -0,0 +1,122 @@
+"""Рекомендации «кого читать».
+
+Считаются офлайн по всему графу подписок (manage.py compute_suggestions
+по расписанию) и хранятся в FollowSuggestion: страница подписок читает
+готовые строки по индексу (user, -score).
+
+Очки кандидата для пользователя U:
+- друзья друзей: FOF_WEIGHT за каждую подписку U, которая его читает;
+- соподписчики: CO_FOLLOW_WEIGHT за каждого читателя тех же авторов,
+  что и U, который его читает. Авторы, у которых подписчиков больше
+  SUGGESTION_HUB_LIMIT, соподписчиков не дают: их читают почти все.
+Пользователям без рекомендаций показываются самые популярные авторы.
+"""
+import heapq
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import transaction
+
+from . import follow_graph
+from .models import Follow, FollowSuggestion
+
+User = get_user_model()
+
+FOF_WEIGHT = 1.0
+CO_FOLLOW_WEIGHT = 0.2
+POPULAR_KEY = 'suggestions:popular'
+
+
+def load_graph():
+    following = defaultdict(set)
+    followers = defaultdict(set)
+    rows = Follow.objects.values_list('user_id', 'author_id')
+    for user_id, author_id in rows.iterator(chunk_size=10000):
+        following[user_id].add(author_id)
+        followers[author_id].add(user_id)
+    return following, followers
+
+
+def score(user_id, following, followers, limit, hub_limit):
+    """[(очки, автор, друзей)] лучших кандидатов по убыванию очков."""
+    mine = following.get(user_id, set())
+    friends = Counter()
+    for friend_id in mine:
+        friends.update(following.get(friend_id, ()))
+    co_followers = Counter()
+    for author_id in mine:
+        readers = followers[author_id]
+        if len(readers) <= hub_limit:
+            co_followers.update(readers)
+    co_followers.pop(user_id, None)
+    scores = Counter({
+        author_id: FOF_WEIGHT * count
+        for author_id, count in friends.items()})
+    for reader_id, shared in co_followers.items():
+        for author_id in following[reader_id]:
+            scores[author_id] += CO_FOLLOW_WEIGHT * shared
+    candidates = (
+        (points, author_id, friends[author_id])
+        for author_id, points in scores.items()
+        if author_id != user_id and author_id not in mine
+    )
+    return heapq.nlargest(limit, candidates)
+
+
+def compute(limit=None, batch_size=500):
+    """Пересчитать рекомендации всех пользователей; вернуть число строк."""
+    limit = limit or settings.SUGGESTIONS_PER_USER
+    hub_limit = settings.SUGGESTION_HUB_LIMIT
+    following, followers = load_graph()
+    user_ids = list(User.objects.values_list('pk', flat=True))
+    saved = 0
+    for start in range(0, len(user_ids), batch_size):
+        batch = user_ids[start:start + batch_size]
+        rows = [
+            FollowSuggestion(user_id=user_id, author_id=author_id,
+                             score=points, friends=friends)
+            for user_id in batch
+            for points, author_id, friends in score(
+                user_id, following, followers, limit, hub_limit)
+        ]
+        # Старые рекомендации пачки заменяются целиком
+        with transaction.atomic():
+            FollowSuggestion.objects.filter(user_id__in=batch).delete()
+            FollowSuggestion.objects.bulk_create(rows)
+        saved += len(rows)
+    caches[settings.FEED_CACHE_ALIAS].delete(POPULAR_KEY)
+    return saved
+
+
+def popular():
+    cache = caches[settings.FEED_CACHE_ALIAS]
+    authors = cache.get(POPULAR_KEY)
+    if authors is None:
+        authors = list(
+            User.objects.filter(stats__followers_count__gt=0)
+            .order_by('-stats__followers_count', 'pk')
+            [:settings.SUGGESTIONS_PER_USER])
+        cache.set(POPULAR_KEY, authors)
+    return authors
+
+
+def for_user(user, limit=None):
+    """Авторы, на которых стоит подписаться, без уже прочитанных."""
+    limit = limit or settings.FOLLOW_SUGGESTIONS
+    # Подписки могли появиться после пересчёта: берём с запасом
+    suggested = [
+        suggestion.author for suggestion in
+        user.follow_suggestions.select_related('author')[:limit * 2]]
+    if len(suggested) < limit:
+        suggested += popular()
+    authors, seen = [], {user.pk}
+    for author in suggested:
+        if author.pk in seen or follow_graph.is_following(user.pk, author.pk):
+            continue
+        seen.add(author.pk)
+        authors.append(author)
+        if len(authors) == limit:
+            break
+    return authors
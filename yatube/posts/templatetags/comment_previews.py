@@ -0,0 +1,23 @@
+from django import template
+from django.conf import settings
+
+from posts.comments import latest
+
+register = template.Library()
+
+
+@register.simple_tag
+def load_comment_previews(posts):
+    """Положить в post.latest_comments последние комментарии постов.
+
+    Вызывается внутри {% cache %}, поэтому закешированная лента не делает
+    запрос вовсе.
+    """
+    posts = list(posts)
+    previews = latest(
+        [post.pk for post in posts if post.comments_count],
+        settings.COMMENT_PREVIEW_SIZE,
+    )
+    for post in posts:
+        post.latest_comments = previews.get(post.pk, [])
+    return ''
@@ -0,0 +1,108 @@
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ApiViewsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Sophia')
+        cls.reader = User.objects.create_user(username='HasNoName')
+        cls.group = Group.objects.create(
+            title='Тестовая группа', slug='test-slug', description='')
+        cls.posts = [
+            Post.objects.create(
+                text=f'Пост {i}', author=cls.author, group=cls.group)
+            for i in range(12)
+        ]
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def test_feeds(self):
+        """Ленты отдают посты в JSON со ссылкой на следующую страницу"""
+        urls = (
+            reverse('posts:api_index'),
+            reverse('posts:api_group_list', args=[self.group.slug]),
+            reverse('posts:api_profile', args=[self.author.username]),
+            reverse('posts:api_follow_index'),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                data = self.client.get(url).json()
+                self.assertEqual(len(data['results']), 10)
+                self.assertEqual(data['results'][0]['id'], self.posts[-1].pk)
+                self.assertEqual(data['results'][0]['group'], 'test-slug')
+                self.assertEqual(data['next'], f'{url}?page=2')
+                self.assertIsNone(data['previous'])
+
+    def test_post_detail(self):
+        post = self.posts[0]
+        Comment.objects.create(text='Комментарий', author=self.reader,
+                               post=post)
+        data = self.client.get(
+            reverse('posts:api_post_detail', args=[post.pk])).json()
+        self.assertEqual(data['text'], post.text)
+        self.assertEqual(data['author'], 'Sophia')
+        self.assertEqual(data['comments'][0]['text'], 'Комментарий')
+
+    def test_conditional_get(self):
+        """Неизменная лента отдаёт 304, правка поста меняет ETag"""
+        url = reverse('posts:api_index')
+        response = self.client.get(url)
+        self.assertFalse(response.has_header('Last-Modified'))
+        etag = response['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+
+        post = Post.objects.get(pk=self.posts[0].pk)
+        post.text = 'Исправленный пост'
+        post.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_edits_change_etag(self):
+        """Правка комментария и отписка меняют ETag"""
+        post = self.posts[0]
+        comment = Comment.objects.create(
+            text='Комментарий', author=self.reader, post=post)
+        urls = (
+            reverse('posts:api_post_detail', args=[post.pk]),
+            reverse('posts:api_follow_index'),
+        )
+        etags = [self.client.get(url)['ETag'] for url in urls]
+        comment.text = 'Исправленный комментарий'
+        comment.save()
+        Follow.objects.filter(user=self.reader).delete()
+        for url, etag in zip(urls, etags):
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_follow_requires_login(self):
+        response = Client().get(reverse('posts:api_follow_index'))
+        self.assertEqual(response.status_code, HTTPStatus.UNAUTHORIZED)
+
+    def test_missing_objects(self):
+        urls = (
+            reverse('posts:api_group_list', args=['missing']),
+            reverse('posts:api_profile', args=['missing']),
+            reverse('posts:api_post_detail', args=[0]),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
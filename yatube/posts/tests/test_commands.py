@@ -0,0 +1,188 @@
+import os
+import tempfile
+from datetime import datetime, timedelta, timezone
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+DB_SESSIONS = 'django.contrib.sessions.backends.db'
+CACHE_SESSIONS = 'django.contrib.sessions.backends.cache'
+
+
+class ExplainFeedsCommandTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Sophia')
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        Follow.objects.create(user=cls.user, author=cls.author)
+        Post.objects.create(
+            text='Тестовый пост', author=cls.author, group=cls.group)
+
+    def test_feed_queries_use_indexes(self):
+        """Запросы лент не делают полных проходов и сортировок"""
+        out = StringIO()
+        call_command('explain_feeds', '--fail', stdout=out)
+        self.assertNotIn('WARN', out.getvalue())
+
+
+class TransferPostsCommandTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.pub_date = datetime(2020, 5, 17, 12, 30, tzinfo=timezone.utc)
+        for i in range(5):
+            post = Post.objects.create(
+                text=f'Пост; «№» {i}', author=cls.author,
+                group=cls.group if i % 2 else None)
+            Post.objects.filter(pk=post.pk).update(pub_date=cls.pub_date)
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def round_trip(self, name):
+        """Выгрузить посты, удалить их вместе с авторами и загрузить."""
+        path = os.path.join(self.directory, name)
+        call_command('export_posts', path, stderr=StringIO())
+        expected = list(Post.objects.order_by('pk').values_list(
+            'text', 'pub_date', 'author__username', 'group__slug'))
+        User.objects.all().delete()
+        call_command(
+            'import_posts', path, '--create-missing', '--batch-size=2',
+            stdout=StringIO())
+        imported = list(Post.objects.order_by('pk').values_list(
+            'text', 'pub_date', 'author__username', 'group__slug'))
+        self.assertEqual(imported, expected)
+        self.assertEqual(
+            User.objects.get(username='author').stats.posts_count, 5)
+
+    def test_round_trip(self):
+        for name in ('posts.jsonl', 'posts.csv'):
+            with self.subTest(name=name):
+                self.round_trip(name)
+
+    def test_default_batch_size_on_large_file(self):
+        path = os.path.join(self.directory, 'posts.jsonl')
+        with open(path, 'w', encoding='utf-8') as stream:
+            for i in range(1200):
+                stream.write(f'{{"text": "Пост {i}", "author": "author"}}\n')
+        call_command('import_posts', path, stdout=StringIO())
+        self.assertEqual(Post.objects.count(), 1205)
+
+    def test_broken_file_keeps_counters(self):
+        path = os.path.join(self.directory, 'posts.jsonl')
+        with open(path, 'w', encoding='utf-8') as stream:
+            stream.write('{"text": "Пост", "author": "author"}\n' * 2)
+            stream.write('не JSON\n')
+        with self.assertRaises(CommandError):
+            call_command('import_posts', path, '--batch-size=2',
+                         stdout=StringIO())
+        # Первая пачка сохранена, счётчики пересчитаны несмотря на ошибку
+        self.assertEqual(
+            User.objects.get(username='author').stats.posts_count, 7)
+
+    def test_unknown_authors_are_skipped(self):
+        path = os.path.join(self.directory, 'posts.jsonl')
+        with open(path, 'w', encoding='utf-8') as stream:
+            stream.write(
+                '{"text": "Пост", "author": "author"}\n'
+                '{"text": "Пост", "author": "stranger"}\n'
+                '{"text": "Пост", "author": "author", "pub_date": "вчера"}\n'
+            )
+        out = StringIO()
+        call_command('import_posts', path, stdout=out)
+        self.assertIn('Загружено постов: 1, пропущено: 2', out.getvalue())
+        self.assertFalse(User.objects.filter(username='stranger').exists())
+
+
+class SeedAndBenchmarkCommandTest(TestCase):
+    def test_seed_and_benchmark(self):
+        out = StringIO()
+        call_command(
+            'seed_data', '--users=10', '--groups=2', '--posts=40',
+            '--comments=20', '--follows=15', '--seed=1', stdout=out)
+        self.assertEqual(Post.objects.count(), 40)
+        self.assertEqual(Follow.objects.count(), 15)
+        # Комментарии разнесены по времени и не старше своих постов
+        comments = Comment.objects.select_related('post')
+        dates = [comment.created for comment in comments]
+        self.assertGreater(max(dates) - min(dates), timedelta(days=1))
+        for comment in comments:
+            self.assertGreaterEqual(comment.created, comment.post.pub_date)
+        # Счётчики и ленты пересобраны, хотя сигналы не срабатывали
+        user = User.objects.order_by('-stats__following_count').first()
+        self.assertEqual(user.stats.following_count,
+                         user.follower.count())
+        self.assertTrue(user.feed_entries.exists())
+
+        out = StringIO()
+        call_command('benchmark_views', '--requests=2', '--warmup=0',
+                     stdout=out)
+        for name in ('index', 'profile', 'post_detail', 'follow_index'):
+            self.assertIn(name, out.getvalue())
+
+
+class ComputeSuggestionsCommandTest(TestCase):
+    def test_friends_of_friends_are_suggested(self):
+        reader, friend, author, star = (
+            User.objects.create_user(username=name)
+            for name in ('reader', 'friend', 'author', 'star'))
+        Follow.objects.create(user=reader, author=friend)
+        Follow.objects.create(user=friend, author=author)
+        Follow.objects.create(user=friend, author=star)
+        Follow.objects.create(user=author, author=star)
+        call_command('compute_suggestions', stdout=StringIO())
+        suggested = reader.follow_suggestions.all()
+        self.assertEqual(
+            [suggestion.author for suggestion in suggested], [star, author])
+        self.assertEqual(suggested[0].friends, 1)
+        self.assertFalse(
+            friend.follow_suggestions.filter(author=friend).exists())
+
+
+class SessionCommandsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='Sophia')
+
+    def test_sessions_move_from_db_to_cache(self):
+        with override_settings(SESSION_ENGINE=DB_SESSIONS):
+            self.client.force_login(self.user)
+        with override_settings(SESSION_ENGINE=CACHE_SESSIONS):
+            call_command('migrate_sessions', '--delete', stdout=StringIO())
+            self.assertFalse(Session.objects.exists())
+            response = self.client.get(reverse('posts:follow_index'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_benchmark_sessions(self):
+        out = StringIO()
+        call_command('benchmark_sessions', '--requests=2', stdout=out)
+        rows = {line.split()[0]: line.split()[1:]
+                for line in out.getvalue().splitlines()[1:-1]}
+        self.assertEqual(set(rows), {'db', 'cached_db', 'cache',
+                                     'signed_cookies'})
+        # Чтение страницы не трогает таблицу сессий без хранилища в базе
+        self.assertEqual(rows['cache'][2], '0.0')
+        self.assertEqual(rows['signed_cookies'][2], '0.0')
@@ -1,10 +1,14 @@
 import tempfile
+from io import BytesIO
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from PIL import Image
 
 from ..forms import PostForm
 from ..models import Group, Post
@@ -100,3 +104,58 @@ class TaskCreateFormTests(TestCase):
             pk=self.post.id, text='Отредактированный пост',
             group=self.group.pk).exists()
         )
+
+    def test_edit_post_keeps_counters(self):
+        """Правка не перезаписывает comments_count устаревшим значением"""
+        with CaptureQueriesContext(connection) as context:
+            self.authorized_client.post(
+                reverse('posts:post_edit', kwargs={'post_id': self.post.id}),
+                {'text': 'Отредактированный пост'})
+        updates = [
+            query['sql'] for query in context.captured_queries
+            if query['sql'].startswith('UPDATE "posts_post"')]
+        self.assertTrue(updates)
+        for sql in updates:
+            self.assertNotIn('comments_count', sql)
+
+
+def make_image(size, image_format='JPEG', name='big.jpg'):
+    buffer = BytesIO()
+    Image.new('RGB', size, color=(200, 30, 30)).save(buffer, image_format)
+    return SimpleUploadedFile(
+        name=name,
+        content=buffer.getvalue(),
+        content_type=f'image/{image_format.lower()}'
+    )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImageUploadLimitsTests(TestCase):
+    def form(self, image):
+        return PostForm(data={'text': 'Пост с картинкой'},
+                        files={'image': image})
+
+    @override_settings(POST_IMAGE_MAX_SIZE=100)
+    def test_large_file_rejected(self):
+        form = self.form(make_image((64, 64)))
+        self.assertFalse(form.is_valid())
+        self.assertEqual(form.errors.as_data()['image'][0].code,
+                         'file_too_large')
+
+    @override_settings(POST_IMAGE_MAX_PIXELS=100 * 100)
+    def test_too_many_pixels_rejected(self):
+        """Число пикселей проверяется по заголовку до декодирования"""
+        form = self.form(make_image((200, 200)))
+        self.assertFalse(form.is_valid())
+        self.assertEqual(form.errors.as_data()['image'][0].code,
+                         'too_many_pixels')
+
+    @override_settings(POST_IMAGE_INGEST_MAX_SIDE=100)
+    def test_large_image_downscaled_on_ingest(self):
+        form = self.form(make_image((400, 200)))
+        self.assertTrue(form.is_valid())
+        form.instance.author = User.objects.create_user(username='Ivan')
+        post = form.save()
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.size, (100, 50))
+            self.assertEqual(image.format, 'JPEG')
@@ -1,16 +1,33 @@
 import tempfile
+from array import array
+from http import HTTPStatus
+from io import StringIO
 
 from django import forms
 from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.core.cache import cache
+from django.core.cache import cache, caches
+from django.core.files.storage import default_storage
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.paginator import Paginator
+from django.db import connection, connections
 from django.db.models.fields.files import ImageFieldFile
-from django.test import Client, TestCase, override_settings
+from django.test import (Client, TestCase, TransactionTestCase,
+                         override_settings)
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
+from core import metrics
+from core.checks import shared_cache_check
+from core.routers import STICKY_COOKIE
+from core.templatetags.pagination import page_window
+
+from .. import follow_graph, follows, fragments, thumbnails, timeline
 from ..forms import PostForm
-from ..models import Comment, Follow, Group, Post
+from ..models import (Comment, FeedEntry, Follow, Group, Post,
+                      PostImageVariant, UserStats)
+from .utils import MaxQueriesMixin
 
 User = get_user_model()
 
@@ -262,6 +279,38 @@ class PostPagesTests(TestCase):
         self.assertTrue(post_image_detail)
         self.assertIsInstance(post_image_detail, ImageFieldFile)
 
+    def test_thumbnail_is_stored_and_rendered(self):
+        """Миниатюра строится вне запроса, шаблон берёт готовый URL"""
+        url = thumbnails.generate(self.post.id)
+        self.post.refresh_from_db()
+        self.assertTrue(url)
+        self.assertEqual(self.post.thumbnail, url)
+        self.assertTrue(self.post.image_variants.filter(
+            format=PostImageVariant.JPEG).exists())
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertContains(response, url)
+        self.assertContains(response, 'srcset=')
+
+    def test_cleared_image_drops_thumbnail(self):
+        """Убранная картинка не остаётся миниатюрой в лентах"""
+        url = thumbnails.generate(self.post.id)
+        files = [
+            variant.url[len(settings.MEDIA_URL):]
+            for variant in self.post.image_variants.all()]
+        self.assertTrue(all(default_storage.exists(name) for name in files))
+        self.authorized_client.get(reverse('posts:index'))
+        post = Post.objects.get(pk=self.post.id)
+        post.image = None
+        post.save()
+        for _, callback in connection.run_on_commit:
+            callback()
+        post.refresh_from_db()
+        self.assertEqual(post.thumbnail, '')
+        self.assertFalse(post.image_variants.exists())
+        self.assertFalse(any(default_storage.exists(name) for name in files))
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertNotContains(response, url)
+
     def test_authorized_client_can_create_comments(self):
         """Тестируем, что комментарировать может только
             авторизованный пользователь"""
@@ -305,15 +354,28 @@ class PostPagesTests(TestCase):
     def test_cache_index_page(self):
         """Тестирование использование кеширования"""
         cache.clear()
+        post = Post.objects.create(text='Кешируемый пост', author=self.user)
         response = self.authorized_client.get(reverse('posts:index'))
         cache_check = response.content
-        post = Post.objects.get(pk=1)
-        post.delete()
+        # Изменение в обход сигналов не сбрасывает кеш
+        Post.objects.filter(pk=post.pk).update(text='Изменённый пост')
         response = self.authorized_client.get(reverse('posts:index'))
         self.assertEqual(response.content, cache_check)
-        cache.clear()
+        # Удаление поста сбрасывает версию фрагмента
+        post.delete()
         response = self.authorized_client.get(reverse('posts:index'))
         self.assertNotEqual(response.content, cache_check)
+        self.assertNotContains(response, 'Кешируемый пост')
+
+    def test_fragment_cache_invalidated_by_comment(self):
+        """Новый комментарий сразу виден на странице поста"""
+        cache.clear()
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        self.authorized_client.get(url)
+        Comment.objects.create(
+            text='Свежий комментарий', author=self.user, post=self.post)
+        response = self.authorized_client.get(url)
+        self.assertContains(response, 'Свежий комментарий')
 
 
 class FollowPagesTests(TestCase):
@@ -333,6 +395,8 @@ class FollowPagesTests(TestCase):
         )
 
     def setUp(self):
+        # Граф подписок в кеше переживает откат базы между тестами
+        cache.clear()
         self.follower_client = Client()
         self.follower_client.force_login(self.follower_user)
         self.unfollower_client = Client()
@@ -381,6 +445,34 @@ class FollowPagesTests(TestCase):
         follow_posts = len(response.context['page_obj'])
         self.assertEqual(follow_posts, 0)
 
+    def test_new_post_is_fanned_out_to_followers(self):
+        """Новый пост раскладывается в материализованные ленты"""
+        post = Post.objects.create(text='Новый пост', author=self.author)
+        self.assertTrue(FeedEntry.objects.filter(
+            user=self.follower_user, post=post).exists())
+        self.assertFalse(FeedEntry.objects.filter(
+            user=self.unfollower_user).exists())
+
+    def test_follow_and_unfollow_update_feed(self):
+        self.unfollower_client.get(reverse(
+            'posts:profile_follow', kwargs={'username': 'following'}))
+        self.assertTrue(FeedEntry.objects.filter(
+            user=self.unfollower_user, post=self.post).exists())
+        self.unfollower_client.get(reverse(
+            'posts:profile_unfollow', kwargs={'username': 'following'}))
+        self.assertFalse(FeedEntry.objects.filter(
+            user=self.unfollower_user).exists())
+
+    @override_settings(FEED_FANOUT_LIMIT=0)
+    def test_popular_author_posts_read_on_request(self):
+        """Посты авторов сверх лимита подмешиваются при чтении"""
+        timeline.sync_fanout()
+        post = Post.objects.create(text='Пост звезды', author=self.author)
+        self.assertFalse(FeedEntry.objects.filter(post=post).exists())
+        response = self.follower_client.get(reverse('posts:follow_index'))
+        self.assertIn(post, response.context['page_obj'])
+        self.assertIn(self.post, response.context['page_obj'])
+
 
 class PaginatorViewsTest(TestCase):
     @classmethod
@@ -426,3 +518,729 @@ class PaginatorViewsTest(TestCase):
             with self.subTest(url=url):
                 response = self.authorized_client.get(url, {'page': page})
                 self.assertEqual(len(response.context['page_obj']), pages)
+
+    def test_page_window(self):
+        """Число ссылок на страницы не растёт с числом страниц"""
+        paginator = Paginator(range(10_000), NUM_OF_OBJ)
+        window = {
+            1: [1, 2, 3, 4, None, 999, 1000],
+            500: [1, 2, None, 497, 498, 499, 500, 501, 502, 503, None,
+                  999, 1000],
+            1000: [1, 2, None, 997, 998, 999, 1000],
+        }
+        for number, pages in window.items():
+            with self.subTest(number=number):
+                self.assertEqual(
+                    page_window(paginator.page(number)), pages)
+        self.assertEqual(
+            page_window(Paginator(range(50), NUM_OF_OBJ).page(3)),
+            [1, 2, 3, 4, 5])
+
+    def test_paginator_renders_window(self):
+        Post.objects.bulk_create(
+            Post(text='Пост', author=self.user) for _ in range(200))
+        response = self.authorized_client.get(
+            reverse('posts:index'), {'page': 11})
+        self.assertContains(response, '&hellip;', count=2)
+        self.assertContains(response, '?page=14"')
+        self.assertNotContains(response, '?page=5"')
+
+
+class CursorPaginatorViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Sophia')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        posts = (Post(
+            text='Пост № %s' % i,
+            author=cls.user,
+            group=cls.group) for i in range(23)
+        )
+        Post.objects.bulk_create(posts)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        cache.clear()
+
+    def test_cursor_pages_cover_feed_without_gaps(self):
+        """Проход по курсорам отдаёт все посты ленты ровно один раз"""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': 'test-slug'}),
+            reverse('posts:profile', kwargs={'username': 'Sophia'}),
+        )
+        expected = list(Post.objects.order_by('-pub_date', '-pk'))
+        for url in urls:
+            with self.subTest(url=url):
+                seen = []
+                cursor = ''
+                while True:
+                    response = self.authorized_client.get(
+                        url, {'cursor': cursor})
+                    page_obj = response.context['page_obj']
+                    self.assertLessEqual(len(page_obj), NUM_OF_OBJ)
+                    seen.extend(page_obj)
+                    if not page_obj.has_next():
+                        break
+                    cursor = page_obj.next_cursor
+                self.assertEqual(seen, expected)
+
+    def test_previous_cursor_returns_previous_page(self):
+        url = reverse('posts:index')
+        first = self.authorized_client.get(url, {'cursor': ''})
+        first_page = first.context['page_obj']
+        second = self.authorized_client.get(
+            url, {'cursor': first_page.next_cursor})
+        second_page = second.context['page_obj']
+        self.assertTrue(second_page.has_previous())
+        back = self.authorized_client.get(
+            url, {'cursor': second_page.previous_cursor})
+        self.assertEqual(
+            list(back.context['page_obj']), list(first_page))
+        self.assertFalse(back.context['page_obj'].has_previous())
+
+    def test_follow_cursor_pages_keep_feed_order(self):
+        """Курсоры ленты подписок идут по ключу FeedEntry, с равными датами"""
+        reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=reader, author=self.user)
+        FeedEntry.objects.filter(user=reader).update(
+            pub_date=Post.objects.first().pub_date)
+        client = Client()
+        client.force_login(reader)
+        seen, cursor = [], ''
+        while True:
+            page_obj = client.get(
+                reverse('posts:follow_index'),
+                {'cursor': cursor}).context['page_obj']
+            seen.extend(page_obj)
+            if not page_obj.has_next():
+                break
+            cursor = page_obj.next_cursor
+        self.assertEqual(seen, list(Post.objects.order_by('-pk')))
+        back = client.get(
+            reverse('posts:follow_index'),
+            {'cursor': page_obj.previous_cursor}).context['page_obj']
+        self.assertEqual(list(back), seen[-NUM_OF_OBJ - 3:-3])
+
+    def test_invalid_cursor_falls_back_to_first_page(self):
+        response = self.authorized_client.get(
+            reverse('posts:index'), {'cursor': 'мусор'})
+        self.assertEqual(len(response.context['page_obj']), NUM_OF_OBJ)
+        self.assertFalse(response.context['page_obj'].has_previous())
+
+
+class FeedQueriesTest(MaxQueriesMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        for i in range(NUM_OF_OBJ):
+            author = User.objects.create_user(
+                username=f'author{i}', first_name='Имя', last_name='Фамилия')
+            Follow.objects.create(user=cls.reader, author=author)
+            Post.objects.create(
+                text=f'Пост № {i}', author=author, group=cls.group)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+        cache.clear()
+
+    def test_feeds_have_no_n_plus_one(self):
+        """Число запросов ленты не зависит от числа постов на странице"""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': 'test-slug'}),
+            reverse('posts:profile', kwargs={'username': 'author0'}),
+            reverse('posts:follow_index'),
+        )
+        for url in urls:
+            # На /follow/ ещё рекомендации «кого читать»: строки и популярные
+            with self.subTest(url=url):
+                with self.assertMaxNumQueries(8):
+                    self.authorized_client.get(url)
+
+
+class SearchViewTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Sophia')
+        cls.cat_post = Post.objects.create(
+            text='Наши кошки любят спать на солнце', author=cls.user)
+        cls.dog_post = Post.objects.create(
+            text='Собака гуляет во дворе', author=cls.user)
+        Comment.objects.create(
+            text='А у соседа живут кошки', author=cls.user,
+            post=cls.dog_post)
+
+    def search(self, query):
+        response = self.client.get(reverse('posts:search'), {'q': query})
+        return list(response.context['page_obj'])
+
+    def test_search_backends(self):
+        """Поиск учитывает словоформы, комментарии и удаление постов"""
+        for backend in ('auto', 'inverted'):
+            with self.subTest(backend=backend), override_settings(
+                    SEARCH_BACKEND=backend):
+                call_command('rebuild_search_index', stdout=StringIO())
+                self.assertEqual(
+                    self.search('кошками'), [self.cat_post, self.dog_post])
+                self.assertEqual(self.search('собаки'), [self.dog_post])
+                # Все слова запроса ищутся в одном тексте
+                self.assertEqual(self.search('кошка сосед'),
+                                 [self.dog_post])
+                self.assertEqual(self.search('кошка собака'), [])
+                self.assertEqual(self.search('жираф'), [])
+
+    def test_index_updated_by_signals(self):
+        post = Post.objects.create(
+            text='Жирафы едят листья акации', author=self.user)
+        self.assertEqual(self.search('жираф'), [post])
+        post.delete()
+        self.assertEqual(self.search('жираф'), [])
+
+    def test_paginator_keeps_query(self):
+        Post.objects.bulk_create(
+            Post(text=f'Кошки № {i}', author=self.user) for i in range(12))
+        call_command('rebuild_search_index', stdout=StringIO())
+        response = self.client.get(reverse('posts:search'), {'q': 'кошки'})
+        self.assertContains(
+            response, '?q=%D0%BA%D0%BE%D1%88%D0%BA%D0%B8&amp;page=2')
+
+
+class ConditionalPagesTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Sophia')
+        cls.post = Post.objects.create(text='Тестовый пост', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_guest_pages_are_public(self):
+        """Гость получает 304 и Cache-Control: public"""
+        url = reverse('posts:index')
+        response = self.client.get(url)
+        self.assertIn('public', response['Cache-Control'])
+        self.assertIn('Cookie', response['Vary'])
+        response = self.client.get(
+            url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_user_pages_are_private(self):
+        client = Client()
+        client.force_login(self.user)
+        response = client.get(reverse('posts:index'))
+        self.assertIn('private', response['Cache-Control'])
+        self.assertFalse(response.has_header('ETag'))
+
+    def test_comment_changes_post_validators(self):
+        url = reverse('posts:post_detail', args=[self.post.pk])
+        response = self.client.get(url)
+        etag = response['ETag']
+        Comment.objects.create(
+            text='Комментарий', author=self.user, post=self.post)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertContains(response, 'Комментарий')
+
+    def test_author_stats_change_validators(self):
+        """Подписка и новый пост автора меняют ETag профиля и его постов"""
+        profile = reverse('posts:profile', args=[self.user.username])
+        detail = reverse('posts:post_detail', args=[self.post.pk])
+        etags = [self.client.get(url)['ETag'] for url in (profile, detail)]
+        Follow.objects.create(
+            user=User.objects.create_user(username='reader'),
+            author=self.user)
+        response = self.client.get(profile, HTTP_IF_NONE_MATCH=etags[0])
+        self.assertContains(response, 'Подписчиков: 1')
+        Post.objects.create(text='Ещё пост', author=self.user)
+        response = self.client.get(detail, HTTP_IF_NONE_MATCH=etags[1])
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_edit_and_delete_change_validators(self):
+        """Правка и удаление поста меняют ETag, 304 не ходит в базу"""
+        post = Post.objects.create(text='Старый текст', author=self.user)
+        url = reverse('posts:index')
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        self.assertFalse(response.has_header('Last-Modified'))
+
+        post.text = 'Новый текст'
+        post.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, 'Новый текст')
+        etag = response['ETag']
+        post.delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertNotContains(response, 'Новый текст')
+
+
+class FragmentVersionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_key_names_scopes_and_bump_counts(self):
+        key = fragments.key('index', 'post:1')
+        self.assertRegex(key, r'^all=\d+\.index=\d+\.post:1=\d+$')
+        version = fragments.versions('index')[1]
+        fragments.bump('index')
+        self.assertEqual(fragments.versions('index')[1], version + 1)
+        self.assertNotEqual(fragments.key('index', 'post:1'), key)
+
+    @override_settings(SHARED_CACHE=False, DEBUG=False, TESTING=False)
+    def test_local_cache_warns_outside_debug(self):
+        messages = shared_cache_check(None)
+        self.assertEqual([m.id for m in messages], ['core.W001'])
+        with override_settings(SHARED_CACHE=True):
+            self.assertEqual(shared_cache_check(None), [])
+
+
+@override_settings(MIDDLEWARE=[
+    'core.profiling.TemplateProfilerMiddleware', *settings.MIDDLEWARE])
+class TemplateProfilingTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Sophia')
+        Post.objects.create(text='Тестовый пост', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_includes_are_timed(self):
+        """Профилировщик пишет время каждого шаблона и include"""
+        with self.assertLogs('core.profiling', 'INFO') as logs:
+            response = self.client.get(reverse('posts:index'))
+        summary = response.wsgi_request.template_profile.summary()
+        counts = {row[0]: row[1] for row in summary}
+        self.assertEqual(counts['posts/index.html'], 1)
+        self.assertIn('posts/includes/paginator.html', counts)
+        self.assertIn('posts/index.html', logs.output[0])
+
+
+class RequestMetricsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Sophia')
+        Post.objects.create(text='Тестовый пост', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        overridden = override_settings(
+            SERVER_TIMING=True, METRICS_DIR=directory.name)
+        overridden.enable()
+        self.addCleanup(overridden.disable)
+        metrics.reset()
+
+    def test_server_timing_and_dump(self):
+        """Метрики попадают в Server-Timing и в сводку dump_metrics"""
+        self.client.get(reverse('posts:index'))
+        response = self.client.get(reverse('posts:index'))
+        header = response['Server-Timing']
+        self.assertIn('total;dur=', header)
+        self.assertIn('db;dur=', header)
+        # Второй запрос берёт ленту из кеша фрагментов
+        self.assertNotIn('0 hits', header)
+
+        metrics.flush(force=True)
+        out = StringIO()
+        call_command('dump_metrics', stdout=out)
+        self.assertIn(':index', out.getvalue())
+        histogram = next(iter(metrics.load().values()))
+        self.assertEqual(histogram['requests'], 2)
+        self.assertEqual(sum(histogram['buckets']), 2)
+
+    @override_settings(METRICS_FLUSH_REQUESTS=2)
+    def test_flush_every_n_requests(self):
+        self.client.get(reverse('posts:index'))
+        self.assertEqual(metrics.load(), {})
+        self.client.get(reverse('posts:index'))
+        histogram = next(iter(metrics.load().values()))
+        self.assertEqual(histogram['requests'], 2)
+
+
+@override_settings(COMMENTS_PER_PAGE=5, COMMENT_MAX_DEPTH=1)
+class CommentThreadsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Sophia')
+        cls.post = Post.objects.create(text='Тестовый пост', author=cls.user)
+        Comment.objects.bulk_create(
+            Comment(text=f'Комментарий {i}', author=cls.user, post=cls.post)
+            for i in range(7))
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_comments_are_paginated(self):
+        """На странице поста только первая страница комментариев"""
+        response = self.client.get(
+            reverse('posts:post_detail', args=[self.post.pk]))
+        self.assertEqual(len(response.context['comments']), 5)
+        next_cursor = response.context['comments'].next_cursor
+        self.assertContains(response, f'cursor={next_cursor}')
+
+        response = self.client.get(
+            reverse('posts:comments', args=[self.post.pk]),
+            {'cursor': next_cursor})
+        self.assertEqual(
+            [comment.text for comment in response.context['comments']],
+            ['Комментарий 5', 'Комментарий 6'])
+        self.assertNotContains(response, 'Показать ещё')
+
+    def test_replies_respect_max_depth(self):
+        root = Comment.objects.order_by('pk').first()
+        url = reverse('posts:add_comment', args=[self.post.pk])
+        self.authorized_client.post(
+            url, {'text': 'Ответ', 'parent': root.pk})
+        reply = Comment.objects.get(text='Ответ')
+        self.assertEqual((reply.parent, reply.depth), (root, 1))
+        # Ответ на ответ встаёт рядом с ним: глубже 1 нельзя
+        self.authorized_client.post(
+            url, {'text': 'Ответ на ответ', 'parent': reply.pk})
+        nested = Comment.objects.get(text='Ответ на ответ')
+        self.assertEqual((nested.parent, nested.depth), (root, 1))
+
+        response = self.client.get(
+            reverse('posts:post_detail', args=[self.post.pk]))
+        self.assertNotContains(response, 'Ответ на ответ')
+        self.assertContains(response, 'Ответы: 2')
+        response = self.client.get(
+            reverse('posts:comments', args=[self.post.pk]),
+            {'parent': root.pk})
+        self.assertEqual(len(response.context['comments']), 2)
+
+    def test_foreign_parent_is_ignored(self):
+        other = Post.objects.create(text='Другой пост', author=self.user)
+        foreign = Comment.objects.create(
+            text='Чужой', author=self.user, post=other)
+        self.authorized_client.post(
+            reverse('posts:add_comment', args=[self.post.pk]),
+            {'text': 'Ответ', 'parent': foreign.pk})
+        self.assertIsNone(Comment.objects.get(text='Ответ').parent)
+
+
+class CommentPreviewTests(MaxQueriesMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Sophia')
+        cls.posts = [
+            Post.objects.create(text=f'Пост № {i}', author=cls.user)
+            for i in range(NUM_OF_OBJ)
+        ]
+        for post in cls.posts:
+            for i in range(5):
+                Comment.objects.create(
+                    text=f'Комментарий {post.pk}-{i}', author=cls.user,
+                    post=post)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_feed_shows_latest_comments(self):
+        response = self.client.get(reverse('posts:index'))
+        post = response.context['page_obj'][0]
+        self.assertEqual(
+            [comment.text for comment in post.latest_comments],
+            [f'Комментарий {post.pk}-{i}' for i in range(2, 5)])
+        self.assertNotContains(response, f'Комментарий {post.pk}-1<')
+        self.assertContains(response, 'Все комментарии: 5')
+
+    def test_previews_take_one_query(self):
+        """Превью всей страницы ленты — один запрос"""
+        with self.assertMaxNumQueries(7):
+            self.client.get(reverse('posts:index'))
+
+    def test_new_comment_refreshes_feed(self):
+        url = reverse('posts:profile', args=[self.user.username])
+        self.client.get(url)
+        post = self.posts[-1]
+        Comment.objects.create(text='Свежий', author=self.user, post=post)
+        self.assertContains(self.client.get(url), 'Свежий')
+
+    def test_default_ordering(self):
+        comments = list(self.posts[0].comments.all())
+        self.assertEqual(
+            comments, sorted(comments, key=lambda c: (c.created, c.pk)))
+
+
+class FollowGraphTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.friend = User.objects.create_user(username='friend')
+        cls.author = User.objects.create_user(username='author')
+        Follow.objects.create(user=cls.reader, author=cls.friend)
+        Follow.objects.create(user=cls.friend, author=cls.reader)
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.reader)
+
+    def test_graph_is_read_from_cache(self):
+        follow_graph.following(self.reader.pk)
+        with self.assertNumQueries(1):
+            # Подписки друга ещё не в кеше, подписки читателя — уже там
+            self.assertEqual(follow_graph.mutual(self.reader.pk),
+                             [self.friend.pk])
+        with self.assertNumQueries(0):
+            self.assertTrue(
+                follow_graph.is_following(self.reader.pk, self.author.pk))
+            self.assertFalse(
+                follow_graph.is_following(self.author.pk, self.reader.pk))
+            self.assertEqual(follow_graph.mutual(self.reader.pk),
+                             [self.friend.pk])
+
+    def test_follow_views_update_cached_graph(self):
+        self.assertEqual(follow_graph.followers_count(self.author.pk), 1)
+        self.client.get(reverse('posts:profile_unfollow',
+                                args=[self.author.username]))
+        self.assertFalse(
+            follow_graph.is_following(self.reader.pk, self.author.pk))
+        self.assertEqual(follow_graph.followers_count(self.author.pk), 0)
+        self.client.get(reverse('posts:profile_follow',
+                                args=[self.author.username]))
+        # Подписки перечитываются из базы один раз, счётчик уже в кеше
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                list(follow_graph.following(self.reader.pk)),
+                sorted([self.friend.pk, self.author.pk]))
+            self.assertEqual(follow_graph.followers_count(self.author.pk), 1)
+        with self.assertNumQueries(0):
+            follow_graph.following(self.reader.pk)
+        response = self.client.get(
+            reverse('posts:profile', args=[self.author.username]))
+        self.assertTrue(response.context['following'])
+
+    def test_follow_drops_stale_cached_graph(self):
+        """Подписка не дописывает автора в устаревший массив из кеша"""
+        other = User.objects.create_user(username='other')
+        # Массив, который параллельный запрос успел положить до нас
+        caches[settings.FEED_CACHE_ALIAS].set(
+            follow_graph.FOLLOWING_KEY.format(other.pk),
+            array('q', [self.friend.pk]))
+        Follow.objects.create(user=other, author=self.author)
+        self.assertEqual(
+            list(follow_graph.following(other.pk)), [self.author.pk])
+
+
+class FollowBulkTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.authors = [
+            User.objects.create_user(username=f'author{i}') for i in range(3)]
+        for author in cls.authors:
+            Post.objects.create(text=f'Пост {author.username}', author=author)
+        Follow.objects.create(user=cls.authors[1], author=cls.authors[0])
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.reader)
+
+    def test_bulk_follow_and_unfollow(self):
+        url = reverse('posts:follow_bulk')
+        usernames = [author.username for author in self.authors]
+        with self.assertNumQueries(17):
+            response = self.client.post(
+                url, {'follow': usernames + ['reader', 'nobody']})
+        self.assertRedirects(response, reverse('posts:follow_index'))
+        self.assertEqual(
+            set(Follow.objects.filter(user=self.reader).values_list(
+                'author', flat=True)),
+            {author.pk for author in self.authors})
+        self.reader.stats.refresh_from_db()
+        self.assertEqual(self.reader.stats.following_count, 3)
+        self.assertEqual(
+            UserStats.objects.get(user=self.authors[0]).followers_count, 2)
+        self.assertEqual(
+            FeedEntry.objects.filter(user=self.reader).count(), 3)
+        self.assertTrue(
+            follow_graph.is_following(self.reader.pk, self.authors[2].pk))
+
+        # Повтор ничего не дублирует, отписка проходит через сигналы
+        self.client.post(url, {'follow': usernames[:1],
+                               'unfollow': usernames[1:]})
+        self.assertEqual(
+            list(Follow.objects.filter(user=self.reader).values_list(
+                'author', flat=True)), [self.authors[0].pk])
+        self.reader.stats.refresh_from_db()
+        self.assertEqual(self.reader.stats.following_count, 1)
+        self.assertEqual(
+            FeedEntry.objects.filter(user=self.reader).count(), 1)
+
+    def test_bulk_follow_recounts_from_table(self):
+        # Подписку вставил параллельный bulk_create, счётчики её не видели
+        Follow.objects.bulk_create([
+            Follow(user=self.reader, author=self.authors[0])])
+        follows.follow_many(
+            self.reader, [self.authors[0].pk, self.authors[2].pk])
+        self.assertEqual(
+            UserStats.objects.get(user=self.reader).following_count, 2)
+        self.assertEqual(
+            UserStats.objects.get(user=self.authors[2]).followers_count, 1)
+
+    def test_bulk_follow_backfills_many_posts(self):
+        Post.objects.bulk_create(
+            Post(text=f'Пост {i}', author=author)
+            for author in self.authors for i in range(200))
+        response = self.client.post(
+            reverse('posts:follow_bulk'),
+            {'follow': [author.username for author in self.authors]})
+        self.assertRedirects(response, reverse('posts:follow_index'))
+        self.assertEqual(
+            FeedEntry.objects.filter(user=self.reader).count(),
+            3 * settings.FEED_BACKFILL_SIZE)
+
+    def test_get_is_not_allowed(self):
+        response = self.client.get(reverse('posts:follow_bulk'))
+        self.assertEqual(response.status_code, HTTPStatus.METHOD_NOT_ALLOWED)
+
+    def test_popular_authors_are_suggested_to_newcomers(self):
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertEqual(response.context['suggestions'], [self.authors[0]])
+        self.assertContains(response, 'Кого почитать')
+
+
+class DatabaseConnectionTests(TestCase):
+    def test_sqlite_pragmas_are_applied(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('прагмы только для SQLite')
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)
+            cursor.execute('PRAGMA temp_store')
+            self.assertEqual(cursor.fetchone()[0], 2)
+
+
+@override_settings(DB_REPLICAS=['replica'])
+class ReplicaRoutingTests(TransactionTestCase):
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='writer')
+        self.client.force_login(self.user)
+
+    def get(self, url, **kwargs):
+        with CaptureQueriesContext(connections['replica']) as replica:
+            with CaptureQueriesContext(connection) as primary:
+                response = self.client.get(url, **kwargs)
+        return response, len(primary), len(replica)
+
+    def test_reads_go_to_replica(self):
+        _, primary, replica = self.get(reverse('posts:index'))
+        self.assertEqual(primary, 0)
+        self.assertGreater(replica, 0)
+
+    def test_writer_reads_own_writes(self):
+        response = self.client.post(
+            reverse('posts:post_create'), {'text': 'Свежий пост'})
+        self.assertIn(STICKY_COOKIE, response.cookies)
+        response, _, replica = self.get(reverse('posts:index'))
+        self.assertEqual(replica, 0)
+        self.assertContains(response, 'Свежий пост')
+
+        self.client.cookies.pop(STICKY_COOKIE)
+        _, primary, _ = self.get(reverse('posts:index'))
+        self.assertEqual(primary, 0)
+
+    @override_settings(DB_REPLICAS=['replica', 'default'])
+    def test_one_replica_per_request(self):
+        """Все чтения запроса идут в одну реплику"""
+        for _ in range(10):
+            _, primary, replica = self.get(reverse('posts:index'))
+            self.assertEqual(0, min(primary, replica))
+
+    def test_cache_fills_read_primary(self):
+        """Граф подписок берётся из default, фрагменты реплики — ненадолго"""
+        author = User.objects.create_user(username='author')
+        Follow.objects.create(user=self.user, author=author)
+        cache.clear()
+        with CaptureQueriesContext(connection) as primary:
+            response, _, replica = self.get(
+                reverse('posts:profile', args=[author.username]))
+        self.assertGreater(replica, 0)
+        self.assertTrue(any(
+            'posts_follow' in query['sql']
+            for query in primary.captured_queries))
+        self.assertEqual(
+            response.context['fragment_ttl'], settings.DB_STICKY_SECONDS)
+
+
+class FanOutTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.post = Post.objects.create(text='Старый пост', author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_fan_out_to_many_followers(self):
+        """Раздача не упирается в лимит строк одного INSERT в SQLite"""
+        User.objects.bulk_create(
+            User(username=f'follower{i}') for i in range(600))
+        Follow.objects.bulk_create(
+            Follow(user=user, author=self.author)
+            for user in User.objects.filter(username__startswith='follower'))
+        post = Post.objects.create(text='Новый пост', author=self.author)
+        self.assertEqual(FeedEntry.objects.filter(post=post).count(), 600)
+
+    @override_settings(FEED_FANOUT_LIMIT=2)
+    def test_feeds_follow_threshold_crossing(self):
+        """Переход через порог в запросе только ставит отметку"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertTrue(FeedEntry.objects.filter(user=self.reader).exists())
+        others = [
+            Follow.objects.create(
+                user=User.objects.create_user(username=f'other{i}'),
+                author=self.author)
+            for i in range(2)]
+        self.assertFalse(timeline.is_fanout_author(self.author.pk))
+        # Уборка ждёт rebuild_feeds, пост виден через чтение на лету
+        self.assertTrue(FeedEntry.objects.filter(user=self.reader).exists())
+        post = Post.objects.create(text='Новый пост', author=self.author)
+        self.assertEqual(
+            list(timeline.follow_feed(self.reader)), [post, self.post])
+        self.assertFalse(FeedEntry.objects.filter(post=post).exists())
+
+        # Ниже порога, но не ниже лимита × FEED_FANOUT_RESUME
+        others[0].delete()
+        call_command('rebuild_feeds', '--fanout-only', stdout=StringIO())
+        self.assertFalse(timeline.is_fanout_author(self.author.pk))
+        self.assertFalse(FeedEntry.objects.exists())
+
+        others[1].delete()
+        call_command('rebuild_feeds', '--fanout-only', stdout=StringIO())
+        self.assertTrue(timeline.is_fanout_author(self.author.pk))
+        self.assertEqual(
+            FeedEntry.objects.filter(user=self.reader).count(), 2)
@@ -0,0 +1,35 @@
+from contextlib import ExitStack, contextmanager
+
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+
+
+class MaxQueriesMixin:
+    """Проверка верхней границы числа запросов к базе.
+
+    В отличие от assertNumQueries не ломается от лишнего запроса сессии,
+    но ловит N+1: число запросов не должно расти вместе с числом постов.
+    Считаются запросы ко всем базам теста, в том числе к репликам.
+    """
+
+    @contextmanager
+    def assertMaxNumQueries(self, num, using=None):
+        aliases = [using] if using else [
+            alias for alias in connections
+            if self.databases == '__all__' or alias in self.databases]
+        with ExitStack() as stack:
+            contexts = [
+                stack.enter_context(CaptureQueriesContext(connections[alias]))
+                for alias in aliases]
+            yield contexts
+        captured = [
+            query for context in contexts
+            for query in context.captured_queries]
+        executed = len(captured)
+        if executed > num:
+            queries = '\n'.join(
+                f'{i}. {query["sql"]}'
+                for i, query in enumerate(captured, 1)
+            )
+            self.fail(
+                f'{executed} запросов при допустимых {num}:\n{queries}')
@@ -0,0 +1,116 @@
+"""Фоновая подготовка миниатюр картинок постов.
+
+После сохранения поста с новой картинкой миниатюра строится в пуле
+потоков, а её URL записывается в Post.thumbnail. Там же строятся
+варианты нескольких ширин и форматов (PostImageVariant) для srcset.
+Шаблоны только читают готовые URL и не запускают Pillow во время запроса.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from PIL import Image
+from sorl.thumbnail import delete, get_thumbnail
+from sorl.thumbnail.base import EXTENSIONS
+
+from . import fragments
+from .models import Post, PostImageVariant
+
+logger = logging.getLogger(__name__)
+
+WIDTH, HEIGHT = 960, 339
+GEOMETRY = f'{WIDTH}x{HEIGHT}'
+OPTIONS = {'crop': 'center', 'upscale': True}
+
+_executor = None
+_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.THUMBNAIL_WORKERS,
+                thread_name_prefix='thumbnails',
+            )
+        return _executor
+
+
+def supported_formats():
+    """Форматы из POST_IMAGE_FORMATS, которые умеют Pillow и sorl."""
+    Image.init()
+    return [
+        fmt for fmt in settings.POST_IMAGE_FORMATS
+        if fmt.upper() in Image.SAVE and fmt.upper() in EXTENSIONS
+    ]
+
+
+def build_variants(post):
+    # Не растягиваем маленькие картинки до больших ширин
+    widths = [
+        width for width in settings.POST_IMAGE_WIDTHS
+        if width <= post.image.width
+    ] or [min(settings.POST_IMAGE_WIDTHS)]
+    variants = []
+    for fmt in supported_formats():
+        for width in widths:
+            geometry = f'{width}x{round(width * HEIGHT / WIDTH)}'
+            thumbnail = get_thumbnail(
+                post.image, geometry, format=fmt.upper(),
+                quality=settings.POST_IMAGE_QUALITY, **OPTIONS)
+            variants.append(PostImageVariant(
+                post=post, width=width, format=fmt, url=thumbnail.url))
+    return variants
+
+
+def generate(post_id):
+    """Построить миниатюру и сохранить её URL; вернуть URL или ''."""
+    post = Post.objects.filter(pk=post_id).first()
+    if post is None or not post.image:
+        return ''
+    try:
+        url = get_thumbnail(post.image, GEOMETRY, **OPTIONS).url
+        variants = build_variants(post)
+    except Exception:
+        logger.exception('Не удалось построить миниатюру поста %s', post_id)
+        return ''
+    with transaction.atomic():
+        # Картинку могли заменить, пока строилась миниатюра
+        updated = Post.objects.filter(
+            pk=post_id, image=post.image.name).update(thumbnail=url)
+        if updated:
+            PostImageVariant.objects.filter(post_id=post_id).delete()
+            PostImageVariant.objects.bulk_create(variants)
+    if updated:
+        fragments.bump(*fragments.post_scopes(post))
+    return url
+
+
+def discard(post, old_image):
+    """Забыть миниатюру и варианты поста, у которого убрали картинку."""
+    Post.objects.filter(pk=post.pk).update(thumbnail='')
+    post.thumbnail = ''
+    PostImageVariant.objects.filter(post_id=post.pk).delete()
+    fragments.bump(*fragments.post_scopes(post))
+    # Файлы миниатюр удаляем, только когда отказ от картинки закоммичен;
+    # сам файл картинки не трогаем
+    transaction.on_commit(lambda: delete(old_image, delete_file=False))
+
+
+def _run(post_id):
+    try:
+        generate(post_id)
+    finally:
+        close_old_connections()
+
+
+def schedule(post):
+    """Поставить построение миниатюры в очередь после коммита."""
+    if not settings.THUMBNAIL_ASYNC:
+        transaction.on_commit(lambda: generate(post.pk))
+        return
+    transaction.on_commit(
+        lambda: _get_executor().submit(_run, post.pk))
@@ -0,0 +1,209 @@
+"""Лента подписок с раздачей постов при записи (fan-out-on-write).
+
+Новый пост сразу раскладывается в FeedEntry всех подписчиков автора,
+и /follow/ читает готовую ленту по индексу (user, -pub_date).
+Авторов, у которых подписчиков больше FEED_FANOUT_LIMIT, не раздаём:
+их посты подмешиваются в ленту при чтении (fan-out-on-read), а сами они
+отмечены UserStats.feed_pulled.
+
+Подписка, после которой автор перешагнул порог, только ставит отметку.
+Обратный переход и уборка разосланных записей — массовые операции на
+миллионы строк, поэтому их делает sync_fanout() из manage.py
+rebuild_feeds, а не запрос. Раздача возобновляется, когда подписчиков
+становится меньше FEED_FANOUT_LIMIT × FEED_FANOUT_RESUME: подписка и
+отписка у самого порога не гоняют автора туда и обратно.
+
+После подписки в ленту попадают только FEED_BACKFILL_SIZE последних постов
+автора: более старые видны в его профиле, но не в ленте подписок.
+"""
+from itertools import islice
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Count, F, Q
+
+from . import follow_graph
+from .models import FeedEntry, Follow, Post, UserStats
+
+PULLED_KEY = 'timeline:pulled'
+
+
+def pulled_authors():
+    """Множество авторов, чьи посты читаются на лету."""
+    if settings.FEED_FANOUT_LIMIT is None:
+        return frozenset()
+    cache = caches[settings.FEED_CACHE_ALIAS]
+    authors = cache.get(PULLED_KEY)
+    if authors is None:
+        authors = frozenset(
+            UserStats.objects.using(DEFAULT_DB_ALIAS).filter(
+                feed_pulled=True).values_list('user_id', flat=True))
+        cache.set(PULLED_KEY, authors)
+    return authors
+
+
+def _set_pulled(author_ids, pulled):
+    UserStats.objects.filter(user_id__in=author_ids).update(
+        feed_pulled=pulled)
+    cache = caches[settings.FEED_CACHE_ALIAS]
+    cache.delete(PULLED_KEY)
+    transaction.on_commit(lambda: cache.delete(PULLED_KEY))
+
+
+def is_fanout_author(author_id):
+    return author_id not in pulled_authors()
+
+
+def _followers_totals(author_ids=None):
+    follows = Follow.objects.all()
+    if author_ids is not None:
+        follows = follows.filter(author_id__in=author_ids)
+    return dict(follows.values('author_id').annotate(
+        total=Count('pk')).values_list('author_id', 'total'))
+
+
+def _insert(entries):
+    # В памяти не больше FEED_BATCH_SIZE записей; размер самого INSERT
+    # bulk_create выбирает по ограничениям бэкенда
+    entries = iter(entries)
+    while True:
+        batch = list(islice(entries, settings.FEED_BATCH_SIZE))
+        if not batch:
+            return
+        FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def _latest_posts(author_id):
+    return Post.objects.filter(author_id=author_id).values_list(
+        'pk', 'pub_date')[:settings.FEED_BACKFILL_SIZE]
+
+
+def fan_out_post(post):
+    """Разложить новый пост по лентам подписчиков автора."""
+    if not is_fanout_author(post.author_id):
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id).values_list('user_id', flat=True)
+    _insert(
+        FeedEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+        for user_id in followers.iterator()
+    )
+
+
+def add_author(user_id, author_id):
+    """Дозаполнить ленту последними постами нового автора."""
+    add_authors(user_id, [author_id])
+
+
+def add_authors(user_id, author_ids):
+    """То же для нескольких авторов: подписчики считаются одним запросом."""
+    limit = settings.FEED_FANOUT_LIMIT
+    if limit is not None:
+        pulled = pulled_authors()
+        crossed = [
+            author_id for author_id, total in _followers_totals(
+                set(author_ids) - pulled).items()
+            if total > limit]
+        if crossed:
+            # Разосланные записи этих авторов уберёт sync_fanout()
+            _set_pulled(crossed, True)
+        author_ids = set(author_ids) - pulled - set(crossed)
+    _insert(
+        FeedEntry(user_id=user_id, post_id=pk, pub_date=pub_date)
+        for author_id in author_ids
+        for pk, pub_date in _latest_posts(author_id)
+    )
+
+
+def remove_author(user_id, author_id):
+    FeedEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id).delete()
+
+
+def _backfill_followers(author_id):
+    posts = list(_latest_posts(author_id))
+    followers = Follow.objects.filter(author_id=author_id).values_list(
+        'user_id', flat=True)
+    _insert(
+        FeedEntry(user_id=follower_id, post_id=pk, pub_date=pub_date)
+        for follower_id in followers.iterator()
+        for pk, pub_date in posts
+    )
+
+
+def sync_fanout():
+    """Перевести авторов между раздачей и чтением на лету.
+
+    Вернуть (число авторов, ставших читаться на лету,
+    число авторов, снова раздаваемых).
+    """
+    limit = settings.FEED_FANOUT_LIMIT
+    pulled = UserStats.objects.filter(feed_pulled=True).values_list(
+        'user_id', flat=True)
+    if limit is None:
+        to_pull, to_push = [], list(pulled)
+    else:
+        totals = _followers_totals()
+        pulled = set(pulled)
+        to_pull = [author_id for author_id, total in totals.items()
+                   if total > limit and author_id not in pulled]
+        to_push = [
+            author_id for author_id in pulled
+            if totals.get(author_id, 0) < limit * settings.FEED_FANOUT_RESUME]
+    if to_pull:
+        _set_pulled(to_pull, True)
+    for author_id in to_push:
+        with transaction.atomic():
+            _set_pulled([author_id], False)
+            _backfill_followers(author_id)
+    # Записи, разосланные до того, как автор стал читаться на лету
+    FeedEntry.objects.filter(
+        post__author_id__in=pulled_authors()).delete()
+    return len(to_pull), len(to_push)
+
+
+def rebuild(user_id):
+    FeedEntry.objects.filter(user_id=user_id).delete()
+    authors = Follow.objects.filter(user_id=user_id).values_list(
+        'author_id', flat=True)
+    for author_id in authors:
+        add_author(user_id, author_id)
+
+
+def pull_authors(user_id):
+    """Авторы из подписок, чьи посты не раздаются и читаются на лету."""
+    pulled = pulled_authors()
+    if not pulled:
+        return []
+    return [author_id for author_id in follow_graph.following(user_id)
+            if author_id in pulled]
+
+
+# Порядок материализованной ленты и тот же ключ для CursorPaginator.
+# Строка '-feed_entries__post_id' сортировала бы по Post.Meta.ordering
+PUSHED_ORDER = (
+    F('feed_entries__pub_date').desc(), F('feed_entries__post_id').desc())
+PUSHED_CURSOR = {
+    'field': 'feed_entries__pub_date',
+    'tiebreaker': 'feed_entries__post_id',
+}
+
+
+def cursor_key(user):
+    """Ключ курсорной пагинации, совпадающий с порядком follow_feed."""
+    if pull_authors(user.pk):
+        return {}
+    return PUSHED_CURSOR
+
+
+def follow_feed(user):
+    """Посты ленты подписок: материализованная часть плюс «звёзды»."""
+    pulled = pull_authors(user.pk)
+    if not pulled:
+        # Чтение диапазона индекса (user, -pub_date, -post) без сортировки
+        return Post.objects.filter(feed_entries__user=user).order_by(
+            *PUSHED_ORDER)
+    pushed = FeedEntry.objects.filter(user=user).values('post_id')
+    return Post.objects.filter(
+        Q(pk__in=pushed) | Q(author_id__in=pulled))
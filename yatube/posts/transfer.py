@@ -0,0 +1,180 @@
+"""Потоковый импорт и экспорт постов в JSONL и CSV.
+
+Записи читаются и пишутся по одной, а в базу попадают пачками через
+bulk_create, поэтому память не зависит от размера файла. Авторы и группы
+ищутся по username и slug через словари в памяти: на пачку приходится
+не больше одного запроса к каждой таблице.
+
+bulk_create не отправляет сигналы: после импорта нужно пересобрать ленты
+подписок и поисковый индекс (rebuild_feeds, rebuild_search_index).
+"""
+import csv
+import json
+from contextlib import contextmanager
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Group, Post
+
+User = get_user_model()
+
+FIELDS = ('text', 'pub_date', 'author', 'group', 'image')
+
+
+def export_rows(posts, chunk_size=2000):
+    rows = posts.order_by('pk').values_list(
+        'text', 'pub_date', 'author__username', 'group__slug', 'image')
+    for text, pub_date, author, group, image in rows.iterator(chunk_size):
+        yield {
+            'text': text,
+            'pub_date': pub_date.isoformat(),
+            'author': author,
+            'group': group,
+            'image': image or None,
+        }
+
+
+def write_jsonl(rows, stream):
+    for row in rows:
+        stream.write(json.dumps(row, ensure_ascii=False) + '\n')
+        yield row
+
+
+def write_csv(rows, stream):
+    writer = csv.DictWriter(stream, FIELDS)
+    writer.writeheader()
+    for row in rows:
+        writer.writerow(row)
+        yield row
+
+
+def read_jsonl(stream):
+    for line in stream:
+        if line.strip():
+            yield json.loads(line)
+
+
+def read_csv(stream):
+    for row in csv.DictReader(stream):
+        # В CSV нет null: пустая ячейка — это отсутствие значения
+        yield {key: value or None for key, value in row.items()}
+
+
+READERS = {'jsonl': read_jsonl, 'csv': read_csv}
+WRITERS = {'jsonl': write_jsonl, 'csv': write_csv}
+
+
+class Lookup:
+    """Словарь ключ -> pk, который дозагружает недостающие ключи пачкой."""
+
+    def __init__(self, model, field, create=None):
+        self.model = model
+        self.field = field
+        self.create = create
+        self.ids = {}
+
+    def load(self, keys):
+        missing = {key for key in keys if key and key not in self.ids}
+        if not missing:
+            return
+        found = self.model.objects.filter(
+            **{f'{self.field}__in': missing}).values_list(self.field, 'pk')
+        self.ids.update(found)
+        missing -= self.ids.keys()
+        if missing and self.create:
+            self.model.objects.bulk_create(
+                (self.create(key) for key in missing), ignore_conflicts=True)
+            self.ids.update(self.model.objects.filter(
+                **{f'{self.field}__in': missing}
+            ).values_list(self.field, 'pk'))
+
+    def get(self, key):
+        return self.ids.get(key)
+
+
+def _new_user(username):
+    user = User(username=username)
+    user.set_unusable_password()
+    return user
+
+
+def _new_group(slug):
+    return Group(title=slug, slug=slug, description='')
+
+
+@contextmanager
+def keep_dates(model, name):
+    # auto_now_add перезаписал бы заданные даты при bulk_create
+    field = model._meta.get_field(name)
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = True
+
+
+def keep_pub_date():
+    return keep_dates(Post, 'pub_date')
+
+
+def _pub_date(value):
+    if not value:
+        return timezone.now()
+    try:
+        pub_date = parse_datetime(value)
+    except ValueError:
+        return None
+    if pub_date is not None and timezone.is_naive(pub_date):
+        pub_date = timezone.make_aware(pub_date)
+    return pub_date
+
+
+def _batches(rows, size):
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+def import_rows(rows, batch_size=1000, create_missing=False):
+    """Сохранить записи пачками по batch_size, каждую в своей транзакции.
+
+    После каждой пачки отдаёт (сохранено, пропущено) нарастающим итогом.
+    Записи с неверной датой пропускаются, как и записи с неизвестным
+    автором или группой, если create_missing не включён.
+    """
+    authors = Lookup(User, 'username', _new_user if create_missing else None)
+    groups = Lookup(Group, 'slug', _new_group if create_missing else None)
+    imported = skipped = 0
+    with keep_pub_date():
+        for batch in _batches(rows, batch_size):
+            # Пачка сохраняется целиком или не сохраняется вовсе
+            with transaction.atomic():
+                authors.load(row.get('author') for row in batch)
+                groups.load(row.get('group') for row in batch)
+                posts = []
+                for row in batch:
+                    author_id = authors.get(row.get('author'))
+                    group_id = groups.get(row.get('group'))
+                    pub_date = _pub_date(row.get('pub_date'))
+                    if (author_id is None or pub_date is None
+                            or (row.get('group') and group_id is None)):
+                        skipped += 1
+                        continue
+                    posts.append(Post(
+                        text=row.get('text') or '',
+                        pub_date=pub_date,
+                        author_id=author_id,
+                        group_id=group_id,
+                        image=row.get('image') or '',
+                    ))
+                # Размер одного INSERT bulk_create выбирает по бэкенду
+                Post.objects.bulk_create(posts)
+            imported += len(posts)
+            yield imported, skipped
@@ -0,0 +1,66 @@
+"""Проверка и уменьшение загружаемых картинок с ограниченной памятью.
+
+Файлы больше FILE_UPLOAD_MAX_MEMORY_SIZE Django пишет на диск кусками,
+а Pillow здесь читает только заголовок: размеры проверяются до
+декодирования пикселей. Уменьшение при загрузке декодирует JPEG сразу
+в уменьшенном масштабе (Image.draft) и пишет результат во временный файл,
+который хранилище сохраняет кусками.
+"""
+from tempfile import SpooledTemporaryFile
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.template.defaultfilters import filesizeformat
+from PIL import Image
+
+
+def _open(upload):
+    upload.seek(0)
+    if hasattr(upload, 'temporary_file_path'):
+        return Image.open(upload.temporary_file_path())
+    return Image.open(upload)
+
+
+def validate(upload):
+    """Проверить размер файла и число пикселей по заголовку."""
+    if upload.size > settings.POST_IMAGE_MAX_SIZE:
+        raise ValidationError(
+            'Файл слишком большой: %(size)s при допустимых %(limit)s.',
+            code='file_too_large',
+            params={
+                'size': filesizeformat(upload.size),
+                'limit': filesizeformat(settings.POST_IMAGE_MAX_SIZE),
+            },
+        )
+    with _open(upload) as image:
+        width, height = image.size
+    if width * height > settings.POST_IMAGE_MAX_PIXELS:
+        raise ValidationError(
+            'Слишком много пикселей: %(width)s×%(height)s.',
+            code='too_many_pixels',
+            params={'width': width, 'height': height},
+        )
+
+
+def downscale(upload):
+    """Уменьшить картинку до POST_IMAGE_INGEST_MAX_SIDE по большей стороне.
+
+    Возвращает исходный файл, если уменьшать не нужно.
+    """
+    side = settings.POST_IMAGE_INGEST_MAX_SIDE
+    if not side:
+        return upload
+    with _open(upload) as image:
+        if max(image.size) <= side or getattr(image, 'is_animated', False):
+            upload.seek(0)
+            return upload
+        image_format = image.format
+        # Для JPEG декодер сразу работает в уменьшенном масштабе
+        image.draft(image.mode, (side, side))
+        image.thumbnail((side, side))
+        output = SpooledTemporaryFile(
+            max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE)
+        image.save(output, format=image_format)
+    output.seek(0)
+    return File(output, name=upload.name)
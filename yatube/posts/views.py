@@ -1,74 +1,152 @@
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
+from django.http import Http404
 from django.shortcuts import get_object_or_404, redirect, render
-
+from django.utils.functional import SimpleLazyObject
+from django.utils.http import urlencode
+from django.views.decorators.http import require_POST
+
+from . import comments as threads
+from . import (feeds, follow_graph, follows, fragments, search_index,
+               suggestions, timeline)
+from .conditional import (group_scope, index_scope, post_scope, profile_scope,
+                          public_page)
+from .counters import stats_for
 from .forms import CommentForm, PostForm
 from .models import Follow, Group, Post, get_user_model
+from .paginators import CursorPaginator
 
 User = get_user_model()
 
 NUM_OF_OBJ = 10
 
 
-def index(request):
-    posts = Post.objects.all()
+def paginate(request, posts, cursor_key=None):
+    # Курсорная пагинация включается настройкой или параметром ?cursor=
+    if settings.POSTS_CURSOR_PAGINATION or 'cursor' in request.GET:
+        paginator = CursorPaginator(posts, NUM_OF_OBJ, **(cursor_key or {}))
+        return paginator.get_page(request.GET.get('cursor'))
     paginator = Paginator(posts, NUM_OF_OBJ)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    return paginator.get_page(request.GET.get('page'))
+
+
+def _int_or_none(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+@public_page(index_scope)
+def index(request):
+    posts = feeds.index_feed()
+    page_obj = paginate(request, posts)
     context = {
         'page_obj': page_obj,
+        **fragments.context('index'),
     }
     return render(request, 'posts/index.html', context)
 
 
+@public_page(group_scope)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
-    paginator = Paginator(posts, NUM_OF_OBJ)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    posts = feeds.group_feed(group)
+    page_obj = paginate(request, posts)
     context = {
         'group': group,
         'page_obj': page_obj,
+        **fragments.context(f'group:{group.pk}'),
     }
     return render(request, 'posts/group_list.html', context)
 
 
+@public_page(profile_scope)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    posts = author.posts.all()
-    sum_of_posts = posts.count()
-    paginator = Paginator(posts, NUM_OF_OBJ)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username)
+    stats = stats_for(author)
+    posts = feeds.profile_feed(author)
+    page_obj = paginate(request, posts)
 
-    following = request.user.is_authenticated and Follow.objects.filter(
-        user=request.user, author=author).exists()
+    following = follow_graph.is_following(request.user.pk, author.pk)
 
     context = {
         'author': author,
         'page_obj': page_obj,
-        'sum_of_posts': sum_of_posts,
+        'sum_of_posts': stats.posts_count,
+        'stats': stats,
         'following': following,
+        **fragments.context(f'profile:{author.pk}'),
     }
     return render(request, 'posts/profile.html', context)
 
 
+@public_page(post_scope)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
-    author = post.author
-    sum_of_posts = author.posts.count()
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group')
+        .prefetch_related('image_variants'), id=post_id)
+    sum_of_posts = stats_for(post.author).posts_count
     form = CommentForm()
-    comments = post.comments.all()
+    cursor = request.GET.get('comments', '')
+    # Страница комментариев читается, только если её нет в кеше фрагментов
+    comments = SimpleLazyObject(
+        lambda: threads.comment_page(post, cursor))
+    reply_to_id = _int_or_none(request.GET.get('reply_to'))
+    reply_to = reply_to_id and post.comments.filter(pk=reply_to_id).first()
     context = {
         'post': post,
         'sum_of_posts': sum_of_posts,
         'form': form,
         'comments': comments,
+        'comments_cursor': cursor,
+        'reply_to': reply_to,
+        **fragments.context(f'post:{post.pk}'),
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+@public_page(post_scope)
+def comments(request, post_id):
+    # Фрагмент со страницей комментариев или ответов для подгрузки
+    post = get_object_or_404(Post, id=post_id)
+    parent_id = request.GET.get('parent')
+    if parent_id is not None:
+        parent_id = _int_or_none(parent_id)
+        if parent_id is None:
+            raise Http404
+    cursor = request.GET.get('cursor', '')
+    context = {
+        'post': post,
+        'comments': SimpleLazyObject(
+            lambda: threads.comment_page(post, cursor, parent_id)),
+        'comments_cursor': cursor,
+        'parent_id': parent_id,
+        **fragments.context(f'post:{post.pk}'),
+    }
+    return render(request, 'posts/includes/comments.html', context)
+
+
+def search(request):
+    query = request.GET.get('q', '').strip()
+    post_ids = search_index.post_ids(query) if query else []
+    page_obj = Paginator(post_ids, NUM_OF_OBJ).get_page(
+        request.GET.get('page'))
+    posts = feeds.with_relations(Post.objects.all()).in_bulk(
+        page_obj.object_list)
+    # Сохраняем порядок ранжирования
+    page_obj.object_list = [
+        posts[pk] for pk in page_obj.object_list if pk in posts]
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+        'page_query': urlencode({'q': query}) + '&',
+    }
+    return render(request, 'posts/search.html', context)
+
+
 @login_required
 def post_create(request):
     form = PostForm(
@@ -93,7 +171,8 @@ def post_edit(request, post_id):
             instance=post
         )
         if form.is_valid():
-            form.save()
+            # Счётчики поста меняются параллельно, пишем только поля формы
+            form.save(commit=False).save(update_fields=PostForm.Meta.fields)
             return redirect('posts:post_detail', post_id=post_id)
         return render(request, 'posts/create_post.html', {
             'form': form, 'is_edit': True})
@@ -108,22 +187,41 @@ def add_comment(request, post_id):
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
+        parent_id = _int_or_none(request.POST.get('parent'))
+        parent = parent_id and post.comments.filter(pk=parent_id).first()
+        threads.attach(comment, parent or None)
         comment.save()
     return redirect('posts:post_detail', post_id=post_id)
 
 
 @login_required
 def follow_index(request):
-    posts = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(posts, NUM_OF_OBJ)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    posts = feeds.follow_feed(request.user)
+    page_obj = paginate(
+        request, posts, timeline.cursor_key(request.user))
     context = {
         'page_obj': page_obj,
+        'suggestions': suggestions.for_user(request.user),
+        # Лента подписок меняется вместе с любым постом из общей ленты
+        **fragments.context('index', f'follow:{request.user.pk}'),
     }
     return render(request, 'posts/follow.html', context)
 
 
+@login_required
+@require_POST
+def follow_bulk(request):
+    # Подписки и отписки списком, например при первом входе
+    def author_ids(field):
+        usernames = request.POST.getlist(field)[:settings.FOLLOW_BULK_LIMIT]
+        return User.objects.filter(
+            username__in=usernames).values_list('pk', flat=True)
+
+    follows.follow_many(request.user, author_ids('follow'))
+    follows.unfollow_many(request.user, author_ids('unfollow'))
+    return redirect('posts:follow_index')
+
+
 @login_required
 def profile_follow(request, username):
     # Подписаться на автора
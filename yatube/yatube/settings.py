@@ -11,6 +11,8 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 
 import os
+import sys
+import tempfile
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -25,6 +27,9 @@ SECRET_KEY = 'u^omn70ad10d!xitszl@r&gd^iku50hek@4q^4sfb=0a1zb-jv'
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = True
 
+# Запущены тесты: manage.py test или pytest
+TESTING = sys.argv[1:2] == ['test'] or 'pytest' in sys.modules
+
 ALLOWED_HOSTS = [
     'localhost',
     '127.0.0.1',
@@ -50,6 +55,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.metrics.RequestMetricsMiddleware',
+    'core.routers.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -62,11 +69,26 @@ MIDDLEWARE = [
 ROOT_URLCONF = 'yatube.urls'
 
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
+# Кешированный загрузчик читает и разбирает шаблоны один раз на процесс;
+# по умолчанию включён, когда DEBUG выключен
+TEMPLATE_CACHE = os.getenv('TEMPLATE_CACHE', str(not DEBUG)) == 'True'
+# Разобрать шаблоны проекта при старте (core/template_cache.py)
+TEMPLATE_WARMUP = TEMPLATE_CACHE and not TESTING
+# Время рендеринга шаблонов и {% include %} в лог core.profiling
+TEMPLATE_PROFILING = os.getenv('TEMPLATE_PROFILING') == 'True'
+
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+if TEMPLATE_CACHE:
+    TEMPLATE_LOADERS = [
+        ('django.template.loaders.cached.Loader', TEMPLATE_LOADERS)]
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
-        'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.debug',
@@ -75,22 +97,99 @@ TEMPLATES = [
                 'django.contrib.messages.context_processors.messages',
                 'core.context_processors.year.year',
             ],
+            'loaders': TEMPLATE_LOADERS,
         },
     },
 ]
 
+if TEMPLATE_PROFILING:
+    MIDDLEWARE.insert(1, 'core.profiling.TemplateProfilerMiddleware')
+
+# Метрики запросов (core/metrics.py): заголовок Server-Timing раскрывает
+# время работы сервера, поэтому по умолчанию он только в DEBUG
+SERVER_TIMING = os.getenv('SERVER_TIMING', str(DEBUG)) == 'True'
+# Строка JSON на каждый запрос в лог core.metrics
+METRICS_LOG = os.getenv('METRICS_LOG', str(DEBUG and not TESTING)) == 'True'
+# Куда и как часто процессы сохраняют гистограммы для manage.py dump_metrics
+METRICS_DIR = os.getenv(
+    'METRICS_DIR', os.path.join(tempfile.gettempdir(), 'yatube-metrics'))
+METRICS_FLUSH_INTERVAL = 60
+# ... или каждые столько запросов; короткие процессы сохраняют их при выходе
+METRICS_FLUSH_REQUESTS = 100
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'core.profiling': {'handlers': ['console'], 'level': 'INFO'},
+        'core.metrics': {
+            'handlers': ['console'],
+            'level': 'INFO' if METRICS_LOG else 'WARNING',
+        },
+    },
+}
+
 WSGI_APPLICATION = 'yatube.wsgi.application'
 
 
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
+# DB_ENGINE: sqlite3 (по умолчанию) или postgresql (нужен psycopg2)
+DB_ENGINE = os.getenv('DB_ENGINE', 'sqlite3')
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'ENGINE': f'django.db.backends.{DB_ENGINE}',
+        'NAME': os.getenv('DB_NAME', os.path.join(BASE_DIR, 'db.sqlite3')
+                          if DB_ENGINE == 'sqlite3' else 'yatube'),
+        # Соединение переживает запрос, а не открывается на каждый заново
+        'CONN_MAX_AGE': int(os.getenv('CONN_MAX_AGE', 60)),
     }
 }
+if DB_ENGINE == 'sqlite3':
+    # Сколько секунд писатель ждёт освобождения блокировки
+    DATABASES['default']['OPTIONS'] = {
+        'timeout': int(os.getenv('SQLITE_TIMEOUT', 20)),
+    }
+else:
+    DATABASES['default'].update({
+        'USER': os.getenv('DB_USER', 'yatube'),
+        'PASSWORD': os.getenv('DB_PASSWORD', ''),
+        'HOST': os.getenv('DB_HOST', 'localhost'),
+        'PORT': os.getenv('DB_PORT', '5432'),
+        # PgBouncer в режиме transaction не держит серверные курсоры,
+        # которые открывает QuerySet.iterator()
+        'DISABLE_SERVER_SIDE_CURSORS': os.getenv('DB_POOLER') == 'True',
+    })
+
+# Реплики для чтения (core/routers.py): DB_REPLICAS — хосты PostgreSQL
+# или файлы SQLite через запятую. В тестах реплика — зеркало default
+DB_REPLICAS = []
+if TESTING:
+    DATABASES['replica'] = {
+        **DATABASES['default'], 'TEST': {'MIRROR': 'default'}}
+else:
+    for number, location in enumerate(
+            filter(None, os.getenv('DB_REPLICAS', '').split(',')), 1):
+        replica = {**DATABASES['default'], 'TEST': {'MIRROR': 'default'}}
+        replica['NAME' if DB_ENGINE == 'sqlite3' else 'HOST'] = location
+        DATABASES[f'replica{number}'] = replica
+        DB_REPLICAS.append(f'replica{number}')
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+# Сколько секунд после записи браузер читает только из основной базы
+DB_STICKY_SECONDS = int(os.getenv('DB_STICKY_SECONDS', 5))
+
+# Прагмы каждого соединения SQLite (core/db.py)
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+}
 
 
 # Password validation
@@ -145,10 +244,125 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+# Загрузки больше этого размера Django пишет во временный файл кусками,
+# поэтому память на запрос не зависит от размера файла
+FILE_UPLOAD_MAX_MEMORY_SIZE = 1024 * 1024
+# Ограничения на картинки постов, см. posts/uploads.py
+POST_IMAGE_MAX_SIZE = 20 * 1024 * 1024
+POST_IMAGE_MAX_PIXELS = 40_000_000
+# Большие картинки уменьшаются при загрузке; None отключает уменьшение
+POST_IMAGE_INGEST_MAX_SIDE = 2560
+
+# Общий кеш для всех процессов: CACHE_BACKEND — класс бэкенда Django
+# (например django.core.cache.backends.memcached.PyLibMCCache),
+# CACHE_LOCATION — адреса серверов через запятую.
+# Без переменных окружения все псевдонимы смотрят в одно хранилище
+# LocMemCache: внутри процесса оно ведёт себя как общий сервер
+# (один clear() на всех, значения сериализуются), этим пользуются тесты.
+CACHE_BACKEND = os.getenv(
+    'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache')
+CACHE_LOCATION = os.getenv('CACHE_LOCATION', 'yatube-shared').split(',')
+if len(CACHE_LOCATION) == 1:
+    CACHE_LOCATION = CACHE_LOCATION[0]
+# LocMemCache у каждого процесса свой: сброс в одном воркере
+# не виден остальным
+SHARED_CACHE = 'locmem' not in CACHE_BACKEND.lower()
+
+
+# Фрагменты сбрасываются версиями в кеше (posts/fragments.py). Без общего
+# кеша сброс виден только своему процессу, поэтому вне DEBUG фрагменты
+# и версии живут минуту, а manage.py check предупреждает (core.W001)
+FRAGMENT_CACHE_TTL = 60 * 60 * 24 if SHARED_CACHE or DEBUG else 60
+FRAGMENT_VERSION_TTL = None if SHARED_CACHE else FRAGMENT_CACHE_TTL
+
+
+def cache_alias(prefix, timeout=300):
+    return {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': CACHE_LOCATION,
+        'KEY_PREFIX': prefix,
+        'TIMEOUT': timeout,
     }
+
+
+CACHES = {
+    'default': cache_alias('default'),
+    # Фрагменты шаблонов, сбрасываются версиями (posts/fragments.py)
+    'fragments': cache_alias('fragments', timeout=FRAGMENT_CACHE_TTL),
+    'sessions': cache_alias('sessions', timeout=60 * 60 * 24 * 14),
+    # Данные лент: подписки, списки идентификаторов
+    'feeds': cache_alias('feeds', timeout=60 * 60),
 }
 
+FRAGMENT_CACHE_ALIAS = 'fragments'
+FEED_CACHE_ALIAS = 'feeds'
+
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
+
+# Хранилище сессий: cached_db, cache, signed_cookies или db.
+# cache и cached_db пишут в псевдоним sessions; при смене хранилища
+# сессии переносит manage.py migrate_sessions. По умолчанию cached_db
+# только с общим кешем: с LocMemCache выход из аккаунта в одном воркере
+# оставил бы сессию живой в кеше остальных
+SESSION_BACKEND = os.getenv(
+    'SESSION_BACKEND', 'cached_db' if SHARED_CACHE else 'db')
+SESSION_ENGINE = f'django.contrib.sessions.backends.{SESSION_BACKEND}'
+SESSION_CACHE_ALIAS = 'sessions'
+
+# Курсорная пагинация лент по (pub_date, id) вместо COUNT(*) + OFFSET.
+# Без этого флага её можно включить для отдельной ссылки параметром ?cursor=
+POSTS_CURSOR_PAGINATION = False
+
+# Окно нумерации страниц: ссылок по обе стороны от текущей и по краям
+PAGINATOR_ON_EACH_SIDE = 3
+PAGINATOR_ON_ENDS = 2
+
+# Комментарии: сколько показывать за раз и до какой глубины вкладывать ответы
+COMMENTS_PER_PAGE = 20
+COMMENT_MAX_DEPTH = 3
+# Сколько последних комментариев показывать под постом в лентах
+COMMENT_PREVIEW_SIZE = 3
+
+# Лента подписок: посты раздаются подписчикам при публикации.
+# Авторы, у которых подписчиков больше лимита, читаются при запросе ленты;
+# None раздаёт посты всех авторов.
+FEED_FANOUT_LIMIT = 10000
+# Раздача возобновляется, когда подписчиков меньше лимита × эта доля.
+# Переходы в обе стороны доделывает manage.py rebuild_feeds (по расписанию)
+FEED_FANOUT_RESUME = 0.9
+# Сколько последних постов автора попадает в ленту сразу после подписки;
+# более старые посты в ленту подписок не попадают
+FEED_BACKFILL_SIZE = 200
+# Сколько записей ленты держать в памяти на один bulk_create
+FEED_BATCH_SIZE = 1000
+
+# Сколько авторов можно подписать или отписать одним запросом
+FOLLOW_BULK_LIMIT = 100
+
+# Рекомендации «кого читать» (posts/suggestions.py): сколько хранить на
+# пользователя, сколько показывать и от какого числа подписчиков автор
+# считается слишком популярным, чтобы искать по нему соподписчиков
+SUGGESTIONS_PER_USER = 20
+FOLLOW_SUGGESTIONS = 5
+SUGGESTION_HUB_LIMIT = 1000
+
+# Сколько секунд браузер или CDN может отдавать гостям ленты и страницы
+# постов без перепроверки (posts/conditional.py)
+PUBLIC_PAGE_MAX_AGE = int(os.getenv('PUBLIC_PAGE_MAX_AGE', 60))
+
+# Миниатюры картинок строятся в фоновом пуле потоков (posts/thumbnails.py);
+# при THUMBNAIL_ASYNC = False — сразу после коммита в потоке запроса.
+# В тестах пул выключен: фоновая запись переживала бы временный MEDIA_ROOT
+THUMBNAIL_ASYNC = not TESTING
+THUMBNAIL_WORKERS = 2
+
+# Варианты картинок для srcset: ширины и форматы в порядке предпочтения.
+# Форматы, которые не поддерживает установленный Pillow, пропускаются
+POST_IMAGE_WIDTHS = (480, 960, 1440)
+POST_IMAGE_FORMATS = ('avif', 'webp', 'jpeg')
+POST_IMAGE_QUALITY = 80
+
+# Поиск: 'auto' — SQLite FTS5, если доступен, иначе обратный индекс;
+# 'inverted' — всегда обратный индекс (posts/search_index.py)
+SEARCH_BACKEND = 'auto'
+SEARCH_MAX_RESULTS = 1000